@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_script(filename):
+    """Imports one of the hyphenated scripts next to this file as a module"""
+    module_name = os.path.splitext(filename)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def synthesize_video(path, width, height, frames, fps=30):
+    """Writes a test clip with moving shapes, a gradient and sensor-like noise"""
+    rng = np.random.default_rng(0)
+    gradient = np.tile(np.linspace(0, 255, width, dtype=np.float32), (height, 1))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(frames):
+        frame = np.empty((height, width, 3), np.uint8)
+        frame[:, :, 0] = gradient
+        frame[:, :, 1] = np.roll(gradient, i * 4, axis=1)
+        frame[:, :, 2] = 255 - gradient
+        x = (i * 7) % max(1, width - height // 4)
+        cv2.circle(frame, (x + height // 8, height // 2), height // 8, (30, 200, 240), -1)
+        cv2.rectangle(frame, (width // 3, (i * 5) % height), (width // 3 + width // 6, (i * 5) % height + height // 6), (220, 40, 90), -1)
+        noise = rng.integers(-8, 9, frame.shape, dtype=np.int16)
+        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        writer.write(frame)
+    writer.release()
+
+def synthesize_clock_video(path, width=320, height=240, frames=60, fps=30):
+    """Writes a static textured clip where only a small clock digit changes every 10 frames"""
+    rng = np.random.default_rng(1)
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for i in range(frames):
+        frame = background.copy()
+        cv2.putText(frame, str(i // 10), (width // 2, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+def verify_delta_roundtrip(codifi, decodifi, temp_dir):
+    """Checks that delta mode stores small, localised changes.
+    
+    Returns the largest per-pixel error between the source frames and the
+    decoded delta archive, which must stay within the encoder's pixel_threshold.
+    """
+    video_path = os.path.join(temp_dir, 'clock.avi')
+    ooo_path = os.path.join(temp_dir, 'clock.ooo')
+    synthesize_clock_video(video_path)
+    codifi.VideoEncoder(delta=True).encode_frames_streaming(video_path, ooo_path)
+    
+    cap = cv2.VideoCapture(video_path)
+    max_error = 0
+    with decodifi.OooVideoReader(ooo_path) as reader:
+        for i in range(len(reader)):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            max_error = max(max_error, int(cv2.absdiff(reader.decode(i), frame).max()))
+    cap.release()
+    return max_error
+
+def run_verification():
+    codifi = load_script('codifi-video.py')
+    decodifi = load_script('decodifi-video.py')
+    limit = codifi.DeltaFrameEncoder().pixel_threshold
+    with tempfile.TemporaryDirectory() as temp_dir:
+        max_error = verify_delta_roundtrip(codifi, decodifi, temp_dir)
+    passed = max_error <= limit
+    print(f"\ndelta round-trip (localised change): max per-pixel error {max_error} "
+          f"(limit {limit}) -> {'OK' if passed else 'FAIL'}")
+    return passed
+
+def peak_rss_mb():
+    """Peak RSS of this process so far; every case runs in its own process, so this is per case"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def summarize(latencies, wall_time=None):
+    latencies_ms = np.array(latencies) * 1000
+    total = wall_time if wall_time is not None else float(np.sum(latencies))
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / total if total > 0 else 0.0,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p90_ms': float(np.percentile(latencies_ms, 90)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'max_ms': float(np.max(latencies_ms))
+    }
+
+class Measurement:
+    """Context manager capturing wall time, process RSS peak and optionally the Python heap peak.
+    
+    tracemalloc slows down numpy allocations noticeably, so it is left off
+    for the per-stage enhancement timings.
+    """
+    def __init__(self, trace_python=True):
+        self.trace_python = trace_python
+        self.python_peak_mb = None
+    
+    def __enter__(self):
+        if self.trace_python:
+            tracemalloc.start()
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall_time = time.perf_counter() - self.start
+        if self.trace_python:
+            self.python_peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        self.rss_peak_mb = peak_rss_mb()
+    
+    def memory(self):
+        return {'python_peak_mb': self.python_peak_mb, 'rss_peak_mb': self.rss_peak_mb}
+
+def timed_call(latencies, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    latencies.append(time.perf_counter() - start)
+    return result
+
+def benchmark_encode(codifi, video_path, output_path, workers):
+    """Times encode_frames_streaming; the per-frame figures are the intervals between written frames in that same run"""
+    encoder = codifi.VideoEncoder(workers=workers)
+    latencies = []
+    last_frame = [0.0]
+    
+    def on_frame(frame_count):
+        now = time.perf_counter()
+        latencies.append(now - last_frame[0])
+        last_frame[0] = now
+    
+    with Measurement() as measurement:
+        last_frame[0] = time.perf_counter()
+        encoder.encode_frames_streaming(video_path, output_path, on_frame)
+    
+    result = summarize(latencies, measurement.wall_time)
+    result.update(measurement.memory())
+    result['output_mb'] = os.path.getsize(output_path) / (1024 * 1024)
+    return result
+
+def benchmark_decode(decodifi, ooo_path):
+    """Times random-access decoding; frames are dropped as they are decoded so the heap peak is the reader's own"""
+    latencies = []
+    with Measurement() as measurement:
+        with decodifi.OooVideoReader(ooo_path) as reader:
+            for i in range(len(reader)):
+                timed_call(latencies, reader.decode, i)
+    
+    result = summarize(latencies, measurement.wall_time)
+    result.update(measurement.memory())
+    return result
+
+def load_frames(decodifi, ooo_path):
+    with decodifi.OooVideoReader(ooo_path) as reader:
+        return list(reader)
+
+def benchmark_presets(decodifi, frames, presets):
+    enhancer = decodifi.VideoEnhancer()
+    fused_enhancer = decodifi.FusedVideoEnhancer()
+    fast_enhancer = decodifi.FastVideoEnhancer()
+    results = {}
+    
+    for preset in presets:
+        config = enhancer.enhancement_presets[preset]
+        stages = [
+            ('white_balance', lambda f: enhancer.auto_white_balance(f)),
+            ('clahe', lambda f: enhancer.enhance_contrast_adaptive(f)),
+            ('brightness_contrast', lambda f: enhancer.adjust_brightness_contrast(f, config['brightness'], config['contrast'])),
+            ('saturation', lambda f: enhancer.adjust_saturation(f, config['saturation'])),
+            ('sharpness', lambda f: enhancer.enhance_sharpness(f, config['sharpness'])),
+            ('noise_reduction', lambda f: enhancer.reduce_noise(f))
+        ]
+        stage_latencies = {name: [] for name, _ in stages}
+        total_latencies = []
+        fused_latencies = []
+        fast_latencies = []
+        
+        print(f"   preset {preset}...")
+        enhancer.enhance_frame(frames[0], preset)
+        fused_enhancer.enhance_frame(frames[0], preset)
+        fast_enhancer.enhance_frame(frames[0], preset)
+        with Measurement(trace_python=False) as measurement:
+            for frame in frames:
+                enhanced = frame
+                for name, stage in stages:
+                    enhanced = timed_call(stage_latencies[name], stage, enhanced)
+                timed_call(total_latencies, enhancer.enhance_frame, frame, preset)
+                timed_call(fused_latencies, fused_enhancer.enhance_frame, frame, preset)
+                timed_call(fast_latencies, fast_enhancer.enhance_frame, frame, preset)
+        
+        results[preset] = {
+            'enhance_frame': summarize(total_latencies),
+            'fused_enhance_frame': summarize(fused_latencies),
+            'fast_enhance_frame': summarize(fast_latencies),
+            'stages': {name: summarize(latencies) for name, latencies in stage_latencies.items()},
+            'memory': measurement.memory()
+        }
+    return results
+
+def run_case(width, height, frames, presets, workers):
+    """Runs one resolution/length case; called in a fresh process so its RSS peak is its own"""
+    codifi = load_script('codifi-video.py')
+    decodifi = load_script('decodifi-video.py')
+    name = f"{width}x{height}_{frames}f"
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, f'{name}.mp4')
+        ooo_path = os.path.join(temp_dir, f'{name}.ooo')
+        synthesize_video(video_path, width, height, frames)
+        
+        print("   encode...")
+        encode_result = benchmark_encode(codifi, video_path, ooo_path, workers)
+        print("   decode...")
+        decode_result = benchmark_decode(decodifi, ooo_path)
+        preset_results = benchmark_presets(decodifi, load_frames(decodifi, ooo_path), presets)
+    
+    return {
+        'name': name,
+        'resolution': f"{width}x{height}",
+        'frames': frames,
+        'encode': encode_result,
+        'decode': decode_result,
+        'presets': preset_results,
+        'rss_peak_mb': peak_rss_mb()
+    }
+
+def run_benchmarks(resolutions, lengths, presets, workers):
+    report = {
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'workers': workers,
+        'cases': []
+    }
+    
+    context = multiprocessing.get_context('spawn')
+    for width, height in resolutions:
+        for frames in lengths:
+            print(f"\nCase {width}x{height}_{frames}f")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                case = executor.submit(run_case, width, height, frames, presets, workers).result()
+            report['cases'].append(case)
+    return report
+
+def print_report(report, baseline=None):
+    baseline_cases = {case['name']: case for case in baseline['cases']} if baseline else {}
+    
+    def line(label, stats, baseline_stats=None):
+        text = (f"   {label:<28} {stats['fps']:>9.1f} FPS | p50 {stats['p50_ms']:>8.2f} ms | "
+                f"p90 {stats['p90_ms']:>8.2f} ms | p99 {stats['p99_ms']:>8.2f} ms")
+        if baseline_stats and baseline_stats['fps'] > 0:
+            text += f" | {stats['fps'] / baseline_stats['fps']:.2f}x vs baseline"
+        print(text)
+    
+    for case in report['cases']:
+        base = baseline_cases.get(case['name'], {})
+        print(f"\n=== {case['name']} ===")
+        line('encode', case['encode'], base.get('encode'))
+        line('decode', case['decode'], base.get('decode'))
+        memory_line = (f"   archive size: {case['encode']['output_mb']:.2f} MB | "
+                       f"heap peak: encode {case['encode']['python_peak_mb']:.1f} MB, "
+                       f"decode {case['decode']['python_peak_mb']:.1f} MB")
+        if case.get('rss_peak_mb') is not None:
+            memory_line += f" | case peak RSS: {case['rss_peak_mb']:.1f} MB"
+        print(memory_line)
+        for preset, result in case['presets'].items():
+            base_preset = base.get('presets', {}).get(preset, {})
+            line(f"{preset}", result['enhance_frame'], base_preset.get('enhance_frame'))
+            line(f"{preset} (fused)", result['fused_enhance_frame'], base_preset.get('fused_enhance_frame'))
+            line(f"{preset} (fast)", result['fast_enhance_frame'], base_preset.get('fast_enhance_frame'))
+            for stage, stats in result['stages'].items():
+                line(f"  {stage}", stats, base_preset.get('stages', {}).get(stage))
+
+def parse_resolution(value):
+    try:
+        width, height = value.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid resolution: {value} (expected WIDTHxHEIGHT)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the .ooo video encode/decode/enhance hot paths")
+    parser.add_argument('--resolutions', nargs='+', type=parse_resolution,
+                        default=[(640, 360), (1280, 720)], help="Frame sizes to test (default: 640x360 1280x720)")
+    parser.add_argument('--frames', nargs='+', type=int, default=[30],
+                        help="Clip lengths in frames (default: 30)")
+    parser.add_argument('--presets', nargs='+', default=None,
+                        help="Enhancement presets to time (default: all except original)")
+    parser.add_argument('--workers', type=int, default=1, help="Encoder worker count (default: 1)")
+    parser.add_argument('--json', dest='json_output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Previous JSON results to compare against")
+    parser.add_argument('--verify', action='store_true',
+                        help="Only run the correctness checks (delta round-trip) and exit")
+    args = parser.parse_args()
+    
+    if args.verify:
+        sys.exit(0 if run_verification() else 1)
+    
+    decodifi = load_script('decodifi-video.py')
+    available_presets = [p for p in decodifi.VideoEnhancer().enhancement_presets if p != 'original']
+    presets = args.presets or available_presets
+    unknown = [p for p in presets if p not in available_presets]
+    if unknown:
+        parser.error(f"Unknown presets: {', '.join(unknown)}")
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+    
+    print("=== VIDEO BENCHMARK ===")
+    report = run_benchmarks(args.resolutions, args.frames, presets, args.workers)
+    print_report(report, baseline)
+    
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"\nResults saved to: {args.json_output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,577 @@
 import os
 import sys
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
 import zlib
+import lzma
+import bz2
 import base64
 import io
+import json
+import hashlib
+import struct
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-def image_to_ooo(image_path, output_dir):
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SUPPORTED_FORMATS = (".webp", ".jpg", ".png", ".jpeg")
+MANIFEST_NAME = ".ooo_manifest.json"
+# Text files with a header start with this tag followed by "key=value;..." and a newline;
+# headerless files are the original base64(zlib(PNG)) format.
+OOO_TEXT_MAGIC = "#OOO1 "
+# Binary files: magic, version, header length, the same "key=value;..." header, raw payload.
+OOO_BINARY_MAGIC = b'\x89OOO'
+OOO_BINARY_VERSION = 1
+OOO_BINARY_HEADER = struct.Struct('<4sBH')
+LEGACY_FIELDS = {'payload': 'png', 'codec': 'zlib'}
+CODEC_LEVELS = {'store': None, 'zlib': (0, 9), 'lzma': (0, 9), 'bz2': (1, 9), 'zstd': (1, 22)}
+# Streaming mode reads, compresses and writes in chunks of this size, and is used
+# automatically for source images larger than STREAM_THRESHOLD.
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_THRESHOLD = 64 * 1024 * 1024
+# Pack files hold many images: a header, the serialized .ooo of every image back to
+# back, an index of (offset, length, crc32, name) entries and a footer pointing at it
+OOO_PACK_EXTENSION = ".ooopack"
+OOO_PACK_MAGIC = b'\x89OOP'
+OOO_PACK_VERSION = 1
+OOO_PACK_HEADER = struct.Struct('<4sB')
+OOO_PACK_ENTRY = struct.Struct('<QQIH')
+OOO_PACK_FOOTER = struct.Struct('<QQ4s')
+OOO_PACK_END = b'OOPE'
+# URL downloads: (connect, read) timeout in seconds, retries with exponential backoff
+# on connection errors and these HTTP statuses, and the default thread count for --urls
+DOWNLOAD_TIMEOUT = (10, 60)
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_DOWNLOAD_WORKERS = 8
+BENCHMARK_CODECS = ['store', 'zlib:1', 'zlib:6', 'zlib:9', 'bz2:9', 'lzma:0', 'lzma:6', 'zstd:3', 'zstd:19']
+
+class StoreCompressor:
+    """No-op codec with the same compress()/flush() interface as zlib.compressobj"""
+    def compress(self, data):
+        return bytes(data)
+
+    def flush(self):
+        return b''
+
+def available_codecs():
+    return [codec for codec in CODEC_LEVELS if codec != 'zstd' or zstandard is not None]
+
+def parse_codec(spec):
+    """Parses 'name' or 'name:level' into (name, level or None)"""
+    name, _, level = spec.partition(':')
+    name = name.strip().lower()
+    if name not in CODEC_LEVELS:
+        raise ValueError(f"Unknown codec '{name}'. Available: {', '.join(available_codecs())}")
+    if name == 'zstd' and zstandard is None:
+        raise ValueError("Codec 'zstd' needs the zstandard package (pip install zstandard)")
+    if not level:
+        return name, None
+    if CODEC_LEVELS[name] is None:
+        raise ValueError(f"Codec '{name}' does not take a level")
+    level = int(level)
+    low, high = CODEC_LEVELS[name]
+    if not low <= level <= high:
+        raise ValueError(f"Level for '{name}' must be between {low} and {high}")
+    return name, level
+
+def make_compressor(codec, level=None):
+    if codec == 'store':
+        return StoreCompressor()
+    if codec == 'zlib':
+        return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level)
+    if codec == 'lzma':
+        return lzma.LZMACompressor(preset=6 if level is None else level)
+    if codec == 'bz2':
+        return bz2.BZ2Compressor(9 if level is None else level)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+    raise ValueError(f"Unknown codec: {codec}")
+
+def make_decompressor(codec):
+    if codec == 'store':
+        return StoreCompressor()
+    if codec == 'zlib':
+        return zlib.decompressobj()
+    if codec == 'lzma':
+        return lzma.LZMADecompressor()
+    if codec == 'bz2':
+        return bz2.BZ2Decompressor()
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown codec: {codec}")
+
+def compress_payload(data, codec, level=None):
+    compressor = make_compressor(codec, level)
+    return compressor.compress(data) + compressor.flush()
+
+def decompress_payload(data, codec):
+    if codec == 'store':
+        return bytes(data)
+    return make_decompressor(codec).decompress(data)
+
+def detect_image_format(data):
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+def prepare_image_bytes(image_data, raw=False):
+    """Returns (header fields, uncompressed payload) for the given image file bytes.
+
+    In raw mode the source bytes are stored verbatim (no decode, no
+    re-encode) and the source format is recorded in the header so the
+    decoder can restore the original file. Otherwise the image is
+    re-encoded as PNG like the original format.
+    """
+    if raw:
+        source_format = detect_image_format(image_data)
+        if source_format is None:
+            raise ValueError("Unrecognized image data, cannot store raw bytes")
+        return {'payload': 'raw', 'format': source_format}, image_data
+
+    img = Image.open(io.BytesIO(image_data))
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format="PNG")
+    return {'payload': 'png'}, img_byte_arr.getvalue()
+
+def add_codec_fields(fields, raw=False, codec=None):
+    """Resolves the codec spec into (name, level) and records it in the header fields.
+
+    codec is a 'name[:level]' spec; by default PNG payloads use zlib (as
+    the original format did) and raw payloads, already compressed, use store.
+    """
+    if codec:
+        name, level = parse_codec(codec)
+    else:
+        name, level = ('store' if raw else 'zlib'), None
+    fields['codec'] = name
+    if level is not None:
+        fields['level'] = level
+    return name, level
+
+def build_ooo_payload(image_data, raw=False, codec=None):
+    """Returns (header fields, payload bytes)"""
+    fields, data = prepare_image_bytes(image_data, raw)
+    name, level = add_codec_fields(fields, raw, codec)
+    return fields, compress_payload(data, name, level)
+
+def serialize_header(fields, binary=False):
+    header = ';'.join(f"{key}={value}" for key, value in fields.items())
+    if binary:
+        header_bytes = header.encode('ascii')
+        return OOO_BINARY_HEADER.pack(OOO_BINARY_MAGIC, OOO_BINARY_VERSION, len(header_bytes)) + header_bytes
+    if fields == LEGACY_FIELDS:
+        # Keep the headerless layout so older decoders can still read PNG payloads
+        return b''
+    return f"{OOO_TEXT_MAGIC}{header}\n".encode('ascii')
+
+def serialize_ooo(fields, payload, binary=False):
+    if binary:
+        return serialize_header(fields, binary) + payload
+    return serialize_header(fields, binary) + base64.b64encode(payload)
+
+class Base64StreamWriter:
+    """Base64-encodes arbitrary-sized writes, carrying leftover bytes to keep 3-byte alignment"""
+    def __init__(self, output):
+        self.output = output
+        self.carry = b''
+
+    def write(self, data):
+        data = self.carry + data
+        aligned = len(data) - len(data) % 3
+        self.output.write(base64.b64encode(data[:aligned]))
+        self.carry = data[aligned:]
+
+    def close(self):
+        self.output.write(base64.b64encode(self.carry))
+        self.carry = b''
+
+def stream_encode_file(source_path, output_path, fields, codec, level, binary=False):
+    """Compresses source_path into output_path chunk by chunk; memory use is bounded by STREAM_CHUNK_SIZE"""
+    compressor = make_compressor(codec, level)
+    with open(source_path, 'rb') as source, open(output_path, 'wb') as output:
+        output.write(serialize_header(fields, binary))
+        sink = output if binary else Base64StreamWriter(output)
+        for chunk in iter(lambda: source.read(STREAM_CHUNK_SIZE), b''):
+            sink.write(compressor.compress(chunk))
+        sink.write(compressor.flush())
+        if not binary:
+            sink.close()
+
+def encode_image_file_streaming(image_path, output_dir, raw=False, binary=False, codec=None, output_name=None):
+    output_path = ooo_output_path(image_path, output_dir, output_name)
+
+    if raw:
+        with open(image_path, 'rb') as f:
+            source_format = detect_image_format(f.read(16))
+        if source_format is None:
+            raise ValueError("Unrecognized image data, cannot store raw bytes")
+        fields = {'payload': 'raw', 'format': source_format}
+        name, level = add_codec_fields(fields, raw, codec)
+        stream_encode_file(image_path, output_path, fields, name, level, binary)
+        return output_path
+
+    # The PNG re-encode goes to a temporary file so only the decoded bitmap is held in memory
+    temp_file = tempfile.NamedTemporaryFile(suffix='.png', dir=output_dir, delete=False)
     try:
-        img = Image.open(image_path)
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format="PNG")
-        img_byte_arr = img_byte_arr.getvalue()
+        with temp_file:
+            with Image.open(image_path) as img:
+                img.save(temp_file, format="PNG")
+        fields = {'payload': 'png'}
+        name, level = add_codec_fields(fields, raw, codec)
+        stream_encode_file(temp_file.name, output_path, fields, name, level, binary)
+    finally:
+        os.remove(temp_file.name)
+    return output_path
+
+def build_ooo_data(image_data, raw=False, binary=False, codec=None):
+    fields, payload = build_ooo_payload(image_data, raw, codec)
+    return serialize_ooo(fields, payload, binary)
+
+def ooo_output_path(image_path, output_dir, output_name=None):
+    if output_name is None:
+        output_name = f"{os.path.splitext(os.path.basename(image_path))[0]}.ooo"
+    return os.path.join(output_dir, output_name)
+
+def encode_image_file(image_path, output_dir, raw=False, binary=False, codec=None, stream=False, output_name=None):
+    if stream or os.path.getsize(image_path) > STREAM_THRESHOLD:
+        return encode_image_file_streaming(image_path, output_dir, raw, binary, codec, output_name)
 
-        compressed_data = zlib.compress(img_byte_arr)
-        encoded_data = base64.b64encode(compressed_data).decode('utf-8')
+    with open(image_path, 'rb') as f:
+        encoded_data = build_ooo_data(f.read(), raw, binary, codec)
 
-        original_name = os.path.splitext(os.path.basename(image_path))[0]
-        output_path = os.path.join(output_dir, f"{original_name}.ooo")
+    output_path = ooo_output_path(image_path, output_dir, output_name)
 
-        with open(output_path, 'w') as f:
-            f.write(encoded_data)
+    with open(output_path, 'wb') as f:
+        f.write(encoded_data)
+    return output_path
+
+def image_to_ooo(image_path, output_dir, raw=False, binary=False, codec=None, stream=False):
+    try:
+        output_path = encode_image_file(image_path, output_dir, raw, binary, codec, stream)
         print(f"Image converted and saved to {output_path}")
+        return output_path
 
     except Exception as e:
         print(f"Error processing {image_path}: {e}")
 
-def download_and_convert_image(url, output_dir):
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def convert_image_task(task):
+    """Worker entry point for batch mode; returns a result dict instead of printing"""
+    image_path, planned_path, key, options = task
+    try:
+        output_dir, output_name = os.path.split(planned_path)
+        output_path = encode_image_file(image_path, output_dir, output_name=output_name, **options)
+        stat = os.stat(image_path)
+        return {
+            'key': key,
+            'path': image_path,
+            'ok': True,
+            'output': output_path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_sha256(image_path),
+            'bytes_in': stat.st_size,
+            'bytes_out': os.path.getsize(output_path)
+        }
+    except Exception as e:
+        return {'key': key, 'path': image_path, 'ok': False, 'error': str(e), 'bytes_in': 0, 'bytes_out': 0}
+
+def iter_image_files(root, recursive=False):
+    """Yields os.DirEntry objects for supported images, walking subfolders with os.scandir"""
+    pending_dirs = [root]
+    while pending_dirs:
+        with os.scandir(pending_dirs.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending_dirs.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(SUPPORTED_FORMATS):
+                    yield entry
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (ValueError, OSError) as e:
+        print(f"Warning: Could not read manifest {manifest_path}, starting fresh: {e}")
+        return {}
+
+def save_manifest(manifest_path, manifest):
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'files': manifest}, f, indent=1)
+    os.replace(temp_path, manifest_path)
+
+def unique_name(stem, taken, first_counter=2):
+    """Returns stem, or stem_N with the first free N, comparing names case-insensitively, and marks it taken"""
+    candidate = stem
+    counter = first_counter
+    while candidate.lower() in taken:
+        candidate = f"{stem}_{counter}"
+        counter += 1
+    taken.add(candidate.lower())
+    return candidate
+
+def plan_output_names(keys):
+    """Maps each image key (relative path) to a unique .ooo path relative to the output folder.
+
+    Images that share a folder and a base name (im0.jpg and im0.png) would
+    both write im0.ooo: the first in sorted order keeps it and the others
+    get their extension appended (im0_png.ooo, then _2, _3... if that is
+    taken too). Names are compared case-insensitively.
+    """
+    names = {}
+    taken = set()
+    renamed = []
+    for key in sorted(keys):
+        base = os.path.splitext(key)[0]
+        if base.lower() in taken:
+            renamed.append(key)
+        else:
+            taken.add(base.lower())
+            names[key] = f"{base}.ooo"
+    for key in renamed:
+        base, extension = os.path.splitext(key)
+        names[key] = f"{unique_name(f'{base}_{extension[1:].lower()}', taken)}.ooo"
+    return names
+
+def plan_folder_conversion(input_path, output_dir, manifest, options, recursive=False, force=False):
+    """Returns the conversion tasks for new or changed images and the number of unchanged ones.
+
+    An image is unchanged when its manifest entry still points at an
+    existing .ooo under its planned name, produced with the same options,
+    and either size and mtime match, or the size matches and the content
+    hash is the same (e.g. the file was touched or copied).
+    """
+    entries = {os.path.relpath(entry.path, input_path).replace(os.sep, '/'): entry
+               for entry in iter_image_files(input_path, recursive)}
+    output_names = plan_output_names(entries)
+    tasks = []
+    unchanged = 0
+    for key, entry in entries.items():
+        output_name = output_names[key]
+        stat = entry.stat()
+        record = manifest.get(key)
+        if (record and not force and record.get('options', {}) == options
+                and record['output'] == output_name
+                and os.path.exists(os.path.join(output_dir, output_name))):
+            if record['size'] == stat.st_size and record['mtime'] == stat.st_mtime:
+                unchanged += 1
+                continue
+            if record['size'] == stat.st_size and record['sha256'] == file_sha256(entry.path):
+                record['mtime'] = stat.st_mtime
+                unchanged += 1
+                continue
+        tasks.append((entry.path, os.path.join(output_dir, output_name), key, options))
+    return tasks, unchanged
+
+def record_result(manifest, output_dir, result, options):
+    manifest[result['key']] = {
+        'options': options,
+        'source': os.path.abspath(result['path']),
+        'output': os.path.relpath(result['output'], output_dir).replace(os.sep, '/'),
+        'size': result['size'],
+        'mtime': result['mtime'],
+        'sha256': result['sha256']
+    }
+
+def add_to_summary(summary, result, verbose=False):
+    if result['ok']:
+        summary['converted'] += 1
+        summary['bytes_in'] += result['bytes_in']
+        summary['bytes_out'] += result['bytes_out']
+        if verbose:
+            print(f"Image converted and saved to {result['output']}")
+    else:
+        summary['failed'] += 1
+        summary['errors'].append((result['path'], result['error']))
+        if verbose:
+            print(f"Error processing {result['path']}: {result['error']}")
+
+def convert_batch(tasks, workers, on_result=None):
+    chunksize = max(1, min(64, len(tasks) // (workers * 4)))
+    summary = {'converted': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'errors': []}
+    start_time = time.perf_counter()
+
+    for target_dir in {os.path.dirname(task[1]) for task in tasks}:
+        os.makedirs(target_dir, exist_ok=True)
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(convert_image_task, tasks, chunksize=chunksize)
+    else:
+        executor = None
+        results = map(convert_image_task, tasks)
+
+    try:
+        for done, result in enumerate(results, 1):
+            add_to_summary(summary, result, verbose=workers == 1)
+            if on_result:
+                on_result(done, result)
+            if workers > 1 and done % 1000 == 0:
+                print(f"Progress: {done}/{len(tasks)} images")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    summary['elapsed'] = time.perf_counter() - start_time
+    return summary
+
+def print_batch_summary(summary, output_dir):
+    elapsed = summary['elapsed']
+    total = summary['converted'] + summary['failed']
+    print(f"Conversion completed in {elapsed:.1f}s -> {output_dir}")
+    print(f"  Converted: {summary['converted']}")
+    print(f"  Failed:    {summary['failed']}")
+    print(f"  Bytes in:  {summary['bytes_in'] / (1024 * 1024):.2f} MB")
+    print(f"  Bytes out: {summary['bytes_out'] / (1024 * 1024):.2f} MB")
+    if elapsed > 0:
+        print(f"  Throughput: {total / elapsed:.1f} images/s, "
+              f"{summary['bytes_in'] / (1024 * 1024) / elapsed:.2f} MB/s")
+    for path, error in summary['errors'][:10]:
+        print(f"  Error processing {path}: {error}")
+    if len(summary['errors']) > 10:
+        print(f"  ... and {len(summary['errors']) - 10} more errors")
+
+class OooPackWriter:
+    """Appends serialized .ooo entries to a pack and writes the index and footer on close.
+
+    The pack is built under a temporary name and moved into place once
+    complete, so an interrupted run never leaves a pack without an index.
+    """
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.temp_path = output_path + '.tmp'
+        self.file = open(self.temp_path, 'wb')
+        self.file.write(OOO_PACK_HEADER.pack(OOO_PACK_MAGIC, OOO_PACK_VERSION))
+        self.entries = []
+
+    def add(self, name, data):
+        offset = self.file.tell()
+        self.file.write(data)
+        self.entries.append((name, offset, len(data), zlib.crc32(data)))
+
+    def close(self):
+        index_offset = self.file.tell()
+        for name, offset, length, checksum in self.entries:
+            name_bytes = name.encode('utf-8')
+            self.file.write(OOO_PACK_ENTRY.pack(offset, length, checksum, len(name_bytes)) + name_bytes)
+        self.file.write(OOO_PACK_FOOTER.pack(index_offset, len(self.entries), OOO_PACK_END))
+        self.file.close()
+        os.replace(self.temp_path, self.output_path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.temp_path)
+
+def pack_image_task(task):
+    """Worker entry point for pack mode; returns the serialized .ooo instead of writing a file"""
+    image_path, name, options = task
+    try:
+        with open(image_path, 'rb') as f:
+            image_data = f.read()
+        data = build_ooo_data(image_data, **options)
+        return {'path': image_path, 'name': name, 'ok': True, 'data': data,
+                'bytes_in': len(image_data), 'bytes_out': len(data)}
+    except Exception as e:
+        return {'path': image_path, 'name': name, 'ok': False, 'error': str(e), 'bytes_in': 0, 'bytes_out': 0}
+
+def pack_folder(input_path, output_path, workers=1, recursive=False, options=None):
+    """Encodes every image under input_path into a single indexed pack file.
+
+    Entries are named by their path relative to input_path and written in
+    sorted order; failed images are reported and left out of the pack.
+    """
+    options = options or {}
+    tasks = [(entry.path, os.path.relpath(entry.path, input_path).replace(os.sep, '/'), options)
+             for entry in iter_image_files(input_path, recursive)]
+    tasks.sort(key=lambda task: task[1])
+    summary = {'converted': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'errors': []}
+    start_time = time.perf_counter()
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(pack_image_task, tasks, chunksize=max(1, min(64, len(tasks) // (workers * 4))))
+    else:
+        executor = None
+        results = map(pack_image_task, tasks)
+
+    writer = OooPackWriter(output_path)
+    try:
+        for done, result in enumerate(results, 1):
+            if result['ok']:
+                writer.add(result['name'], result['data'])
+            add_to_summary(summary, result)
+            if done % 1000 == 0:
+                print(f"Progress: {done}/{len(tasks)} images")
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if executor:
+            executor.shutdown()
+
+    summary['elapsed'] = time.perf_counter() - start_time
+    return summary
+
+def make_session(pool_size=1):
+    """Shared session with a connection pool sized for pool_size threads and retry with backoff"""
+    retry = Retry(
+        total=DOWNLOAD_RETRIES,
+        backoff_factor=DOWNLOAD_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET'])
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def url_output_name(url):
+    filename = url.split('/')[-1].split('?')[0]
+    return os.path.splitext(filename)[0] if '.' in filename else 'downloaded_image'
+
+def fetch_and_encode(session, url, output_path, raw=False, binary=False, codec=None):
+    response = session.get(url, timeout=DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+    image_data = response.content
+    encoded_data = build_ooo_data(image_data, raw, binary, codec)
+
+    with open(output_path, 'wb') as f:
+        f.write(encoded_data)
+    return len(image_data)
+
+def download_and_convert_image(url, output_dir, raw=False, binary=False, codec=None):
     try:
         print(f"Downloading image from: {url}")
-        
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        img = Image.open(io.BytesIO(response.content))
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format="PNG")
-        img_byte_arr = img_byte_arr.getvalue()
-
-        compressed_data = zlib.compress(img_byte_arr)
-        encoded_data = base64.b64encode(compressed_data).decode('utf-8')
-
-        filename = url.split('/')[-1].split('?')[0]
-        original_name = os.path.splitext(filename)[0] if '.' in filename else 'downloaded_image'
-        output_path = os.path.join(output_dir, f"{original_name}.ooo")
-
-        with open(output_path, 'w') as f:
-            f.write(encoded_data)
-        
+
+        output_path = os.path.join(output_dir, f"{url_output_name(url)}.ooo")
+        with make_session() as session:
+            fetch_and_encode(session, url, output_path, raw, binary, codec)
+
         print(f"Image downloaded and converted successfully to {output_path}")
         return output_path
 
@@ -56,41 +580,176 @@ def download_and_convert_image(url, output_dir):
     except Exception as e:
         print(f"Error processing image: {e}")
 
-def process_input(input_path):
+def read_url_list(list_path):
+    """Reads one URL per line, skipping blank lines and # comments"""
+    with open(list_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def plan_url_downloads(urls, output_dir):
+    """Returns (url, output_path) pairs with a unique output name per URL.
+
+    The first URL with a given file name keeps it; repeats are numbered
+    (a_1, a_2...), skipping names another URL already uses. Names are
+    compared case-insensitively so downloads don't overwrite each other on
+    Windows either.
+    """
+    names = [url_output_name(url) for url in urls]
+    taken = {name.lower() for name in names}
+    seen = set()
+    tasks = []
+    for url, name in zip(urls, names):
+        if name.lower() in seen:
+            name = unique_name(name, taken, 1)
+        seen.add(name.lower())
+        tasks.append((url, os.path.join(output_dir, f"{name}.ooo")))
+    return tasks
+
+def download_url_task(session, url, output_path, options):
+    try:
+        bytes_in = fetch_and_encode(session, url, output_path, **options)
+        return {'path': url, 'ok': True, 'output': output_path,
+                'bytes_in': bytes_in, 'bytes_out': os.path.getsize(output_path)}
+    except Exception as e:
+        return {'path': url, 'ok': False, 'error': str(e), 'bytes_in': 0, 'bytes_out': 0}
+
+def download_batch(urls, output_dir, workers=DEFAULT_DOWNLOAD_WORKERS, options=None):
+    """Downloads and encodes the URLs on a thread pool sharing one pooled session"""
+    options = options or {}
+    tasks = plan_url_downloads(urls, output_dir)
+    summary = {'converted': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'errors': []}
+    start_time = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(download_url_task, session, url, output_path, options)
+                   for url, output_path in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            add_to_summary(summary, future.result())
+            if done % 100 == 0:
+                print(f"Progress: {done}/{len(tasks)} URLs")
+
+    summary['elapsed'] = time.perf_counter() - start_time
+    return summary
+
+def benchmark_codecs(input_path, raw=False, sample_size=200, codecs=None):
+    """Compresses a sample of images with each codec and reports ratio and MB/s"""
+    image_paths = [entry.path for entry in iter_image_files(input_path, recursive=True)][:sample_size]
+    if not image_paths:
+        print("No supported images found for the benchmark")
+        return
+
+    print(f"Preparing {len(image_paths)} sample images ({'raw bytes' if raw else 'PNG re-encode'})...")
+    samples = []
+    for image_path in image_paths:
+        try:
+            with open(image_path, 'rb') as f:
+                samples.append(prepare_image_bytes(f.read(), raw)[1])
+        except Exception as e:
+            print(f"Skipping {image_path}: {e}")
+    total_in = sum(len(sample) for sample in samples)
+    if total_in == 0:
+        print("No usable sample data")
+        return
+
+    codecs = codecs or [spec for spec in BENCHMARK_CODECS if spec.split(':')[0] in available_codecs()]
+    print(f"\nSample size: {total_in / (1024 * 1024):.2f} MB")
+    print(f"{'Codec':<10} {'Ratio':>7} {'Output MB':>10} {'Compress MB/s':>14} {'Decompress MB/s':>16}")
+    results = []
+    for spec in codecs:
+        name, level = parse_codec(spec)
+        start_time = time.perf_counter()
+        compressed = [compress_payload(sample, name, level) for sample in samples]
+        compress_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for sample, payload in zip(samples, compressed):
+            if len(decompress_payload(payload, name)) != len(sample):
+                raise ValueError(f"Round-trip check failed for codec {spec}")
+        decompress_time = time.perf_counter() - start_time
+
+        total_out = sum(len(payload) for payload in compressed)
+        size_mb = total_in / (1024 * 1024)
+        result = {
+            'codec': spec,
+            'ratio': total_out / total_in,
+            'output_mb': total_out / (1024 * 1024),
+            'compress_mbps': size_mb / compress_time if compress_time > 0 else float('inf'),
+            'decompress_mbps': size_mb / decompress_time if decompress_time > 0 else float('inf')
+        }
+        results.append(result)
+        print(f"{spec:<10} {result['ratio']:>7.3f} {result['output_mb']:>10.2f} "
+              f"{result['compress_mbps']:>14.1f} {result['decompress_mbps']:>16.1f}")
+    return results
+
+def process_input(input_path, workers=1, recursive=False, force=False, raw=False, binary=False, codec=None, stream=False,
+                  url_list=False, pack=False):
     try:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         src_dir = os.path.join(script_dir, "src")
         if not os.path.exists(src_dir):
             os.makedirs(src_dir)
 
+        # Input is a text file with one URL per line
+        if url_list:
+            urls = read_url_list(input_path)
+            output_dir = os.path.join(src_dir, os.path.splitext(os.path.basename(input_path))[0])
+            print(f"Downloading {len(urls)} URLs with {workers} workers...")
+            summary = download_batch(urls, output_dir, workers, {'raw': raw, 'binary': binary, 'codec': codec})
+            print_batch_summary(summary, output_dir)
+            return
+
         # Check if input is a URL
         if input_path.startswith(('http://', 'https://')):
-            download_and_convert_image(input_path, src_dir)
+            download_and_convert_image(input_path, src_dir, raw, binary, codec)
             return
 
         # Check if input is a file or directory
         if os.path.isfile(input_path):
-            if input_path.lower().endswith((".webp", ".jpg", ".png", ".jpeg")):
-                image_to_ooo(input_path, src_dir)
+            if input_path.lower().endswith(SUPPORTED_FORMATS):
+                image_to_ooo(input_path, src_dir, raw, binary, codec, stream)
             else:
                 print("Unsupported file format. Use: .webp, .jpg, .png, .jpeg")
 
+        elif os.path.isdir(input_path) and pack:
+            folder_name = os.path.basename(os.path.normpath(input_path))
+            output_path = os.path.join(src_dir, f"{folder_name}{OOO_PACK_EXTENSION}")
+            print(f"Packing {input_path} into {output_path}...")
+            summary = pack_folder(input_path, output_path, workers, recursive, {'raw': raw, 'binary': binary, 'codec': codec})
+            print_batch_summary(summary, output_path)
+
         elif os.path.isdir(input_path):
             folder_name = os.path.basename(os.path.normpath(input_path))
             output_dir = os.path.join(src_dir, folder_name)
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
 
-            supported_formats = (".webp", ".jpg", ".png", ".jpeg")
-            converted_count = 0
+            manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+            manifest = load_manifest(manifest_path)
+            options = {'raw': raw, 'binary': binary, 'codec': codec}
+            tasks, unchanged = plan_folder_conversion(input_path, output_dir, manifest, options, recursive, force)
+            if stream:
+                # Streaming writes the same bytes, so it stays out of the manifest options
+                tasks = [(path, output_path, key, dict(task_options, stream=True))
+                         for path, output_path, key, task_options in tasks]
+            print(f"Found {len(tasks) + unchanged} images: {len(tasks)} to convert, {unchanged} unchanged since last run")
+            if workers > 1:
+                print(f"Converting with {workers} workers...")
+
+            def on_result(done, result):
+                if result['ok']:
+                    record_result(manifest, output_dir, result, options)
+                if done % 1000 == 0:
+                    save_manifest(manifest_path, manifest)
 
-            for filename in os.listdir(input_path):
-                if filename.lower().endswith(supported_formats):
-                    image_path = os.path.join(input_path, filename)
-                    image_to_ooo(image_path, output_dir)
-                    converted_count += 1
+            try:
+                summary = convert_batch(tasks, workers, on_result)
+            finally:
+                save_manifest(manifest_path, manifest)
 
-            print(f"Conversion completed. {converted_count} images converted to {output_dir}")
+            if workers > 1:
+                print_batch_summary(summary, output_dir)
+            else:
+                print(f"Conversion completed. {summary['converted']} images converted to {output_dir}")
 
         else:
             print("Error: The provided path does not exist.")
@@ -98,13 +757,60 @@ def process_input(input_path):
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def parse_int_arg(argv, name, default):
+    if name not in argv:
+        return default
+    try:
+        return max(1, int(argv[argv.index(name) + 1]))
+    except (IndexError, ValueError):
+        print(f"Invalid {name} value, using {default}")
+        return default
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python ooo_encoder.py <image_path|folder_path|image_url>")
+    if len(sys.argv) < 2:
+        print("Usage: python ooo_encoder.py <image_path|folder_path|image_url> [--workers N] [--recursive] [--force] [--raw] [--binary] [--codec NAME[:LEVEL]] [--stream]")
+        print("       python ooo_encoder.py <url_list.txt> --urls [--workers N] [--raw] [--binary] [--codec NAME[:LEVEL]]")
+        print("       python ooo_encoder.py <folder_path> --pack [--workers N] [--recursive] [--raw] [--binary] [--codec NAME[:LEVEL]]")
+        print("       python ooo_encoder.py <folder_path> --benchmark-codecs [--raw]")
         print("\nExamples:")
         print("  Single file: python ooo_encoder.py \"image.jpg\"")
         print("  Folder:      python ooo_encoder.py \"C:\\Photos\"")
+        print("  Parallel:    python ooo_encoder.py \"C:\\Photos\" --workers 8")
+        print("  Subfolders:  python ooo_encoder.py \"C:\\Photos\" --recursive")
+        print("  Raw bytes:   python ooo_encoder.py \"image.jpg\" --raw")
         print("  URL:         python ooo_encoder.py \"https://example.com/image.jpg\"")
+        print("  URL list:    python ooo_encoder.py \"urls.txt\" --urls --workers 16")
+        print("  Pack:        python ooo_encoder.py \"C:\\Photos\" --pack --recursive")
+        print("\n--raw stores the original PNG/JPEG/WebP bytes without re-encoding.")
+        print("--binary writes a binary .ooo (no base64, ~25% smaller).")
+        print(f"--codec picks the compression: {', '.join(available_codecs())} (e.g. zlib:9, lzma:6, store).")
+        print("--stream encodes in fixed-size chunks (automatic above 64 MB) to bound memory use.")
+        print(f"--urls downloads every URL in the file concurrently ({DEFAULT_DOWNLOAD_WORKERS} workers by default) with retries.")
+        print(f"--pack writes the whole folder into one indexed {OOO_PACK_EXTENSION} file instead of one .ooo per image.")
+        print("Folder runs keep a manifest and only convert new or changed images; --force reconverts all.")
+    elif '--benchmark-codecs' in sys.argv:
+        benchmark_codecs(sys.argv[1], raw='--raw' in sys.argv)
     else:
         input_path = sys.argv[1]
-        process_input(input_path)
\ No newline at end of file
+        url_list = '--urls' in sys.argv
+        codec = None
+        if '--codec' in sys.argv:
+            codec_index = sys.argv.index('--codec') + 1
+            try:
+                codec = sys.argv[codec_index]
+                parse_codec(codec)
+            except (IndexError, ValueError) as e:
+                print(f"Invalid --codec value: {e}")
+                sys.exit(1)
+        process_input(
+            input_path,
+            parse_int_arg(sys.argv, '--workers', DEFAULT_DOWNLOAD_WORKERS if url_list else 1),
+            recursive='--recursive' in sys.argv,
+            force='--force' in sys.argv,
+            raw='--raw' in sys.argv,
+            binary='--binary' in sys.argv,
+            codec=codec,
+            stream='--stream' in sys.argv,
+            url_list=url_list,
+            pack='--pack' in sys.argv
+        )
\ No newline at end of file
@@ -7,12 +7,184 @@ import numpy as np
 import re
 import subprocess
 import json
+import struct
+import sys
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 import time
 
+OOO_MAGIC = b'OOOV'
+OOO_VERSION = 2
+OOO_HEADER = struct.Struct('<4sHQQ')
+OOO_INDEX_ENTRY = struct.Struct('<QI')
+OOO_TILE_MAGIC = b'OOOT'
+OOO_TILE_HEADER = struct.Struct('<4sHI')
+OOO_TILE_ENTRY = struct.Struct('<HHI')
+PROXY_SCALE = 0.25
+PROXY_QUALITY = 60
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_QUALITY = 75
+
+class OooVideoWriter:
+    """Writes the binary .ooo v2 container.
+    
+    Layout: header | JPEG payloads | frame index | metadata (JSON).
+    The header points at the metadata block, and the metadata records where
+    the index table starts, so readers can open the file without touching
+    the frame payloads.
+    
+    Optional side tracks (the low-resolution proxy and the thumbnails) are
+    interleaved with the main payloads and get their own index table,
+    listed under metadata['tracks']; readers that don't know about tracks
+    only see the main index.
+    """
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.file = open(output_path, 'wb')
+        self.file.write(OOO_HEADER.pack(OOO_MAGIC, OOO_VERSION, 0, 0))
+        self.index = []
+        self.track_indexes = {}
+    
+    def add_frame(self, payload, track=None):
+        offset = self.file.tell()
+        self.file.write(payload)
+        index = self.index if track is None else self.track_indexes.setdefault(track, [])
+        index.append((offset, len(payload)))
+    
+    def write_index(self, index):
+        index_offset = self.file.tell()
+        for offset, length in index:
+            self.file.write(OOO_INDEX_ENTRY.pack(offset, length))
+        return index_offset
+    
+    def close(self, metadata, track_metadata=None):
+        index_offset = self.write_index(self.index)
+        
+        metadata = dict(metadata)
+        metadata['format'] = 'ooo_encoded_v2.0'
+        metadata['total_frames'] = len(self.index)
+        metadata['index_offset'] = index_offset
+        if self.track_indexes:
+            metadata['tracks'] = {}
+            for track, index in self.track_indexes.items():
+                track_info = dict((track_metadata or {}).get(track, {}))
+                track_info['index_offset'] = self.write_index(index)
+                track_info['total_frames'] = len(index)
+                metadata['tracks'][track] = track_info
+        metadata_bytes = json.dumps(metadata).encode('utf-8')
+        metadata_offset = self.file.tell()
+        self.file.write(metadata_bytes)
+        
+        self.file.seek(0)
+        self.file.write(OOO_HEADER.pack(OOO_MAGIC, OOO_VERSION, metadata_offset, len(metadata_bytes)))
+        self.file.close()
+    
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+class DeltaFrameEncoder:
+    """Encodes frames relative to the previous frame for the v2 container.
+    
+    Each payload is one of:
+      - a full JPEG (keyframe), written every keyframe_interval frames or
+        when too much of the picture changed;
+      - an empty payload, meaning "repeat the previous frame";
+      - a tile patch: OOO_TILE_HEADER followed by (column, row, length)
+        entries and JPEG bytes for every changed tile.
+    A tile counts as changed when its mean absolute difference against the
+    previous decoded frame exceeds threshold (gradual changes over the whole
+    tile), or when any of its pixels differs by more than pixel_threshold
+    (small, high-contrast changes such as a clock digit). The reference
+    frame is kept exactly as the decoder will rebuild it, so differences
+    below the thresholds never accumulate.
+    """
+    def __init__(self, jpeg_quality=90, tile_size=64, threshold=4.0, keyframe_interval=120, max_tile_fraction=0.5,
+                 pixel_threshold=48):
+        self.jpeg_quality = jpeg_quality
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.keyframe_interval = keyframe_interval
+        self.max_tile_fraction = max_tile_fraction
+        self.reference = None
+        self.frames_since_keyframe = 0
+        self.stats = {'keyframes': 0, 'repeats': 0, 'patches': 0, 'tiles': 0}
+    
+    def encode_jpeg(self, image):
+        success, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not success:
+            raise ValueError("JPEG encoding failed")
+        return buffer.tobytes()
+    
+    def changed_tiles(self, frame):
+        height, width = frame.shape[:2]
+        tile = self.tile_size
+        rows = -(-height // tile)
+        cols = -(-width // tile)
+        
+        diff = cv2.absdiff(frame, self.reference).max(axis=2)
+        diff = np.pad(diff, ((0, rows * tile - height), (0, cols * tile - width))).reshape(rows, tile, cols, tile)
+        sums = diff.sum(axis=(1, 3), dtype=np.uint32)
+        tile_heights = np.minimum(tile, height - np.arange(rows) * tile)
+        tile_widths = np.minimum(tile, width - np.arange(cols) * tile)
+        means = sums / np.outer(tile_heights, tile_widths)
+        peaks = diff.max(axis=(1, 3))
+        
+        return np.argwhere((means > self.threshold) | (peaks > self.pixel_threshold)), rows * cols
+    
+    def encode_keyframe(self, frame):
+        payload = self.encode_jpeg(frame)
+        self.reference = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        self.frames_since_keyframe = 0
+        self.stats['keyframes'] += 1
+        return payload
+    
+    def encode(self, frame):
+        if (self.reference is None
+                or self.reference.shape != frame.shape
+                or self.frames_since_keyframe + 1 >= self.keyframe_interval):
+            return self.encode_keyframe(frame)
+        
+        changed, tile_count = self.changed_tiles(frame)
+        if len(changed) > tile_count * self.max_tile_fraction:
+            return self.encode_keyframe(frame)
+        
+        self.frames_since_keyframe += 1
+        if len(changed) == 0:
+            self.stats['repeats'] += 1
+            return b''
+        
+        tile = self.tile_size
+        parts = [OOO_TILE_HEADER.pack(OOO_TILE_MAGIC, tile, len(changed))]
+        for row, col in changed:
+            y, x = row * tile, col * tile
+            tile_payload = self.encode_jpeg(frame[y:y + tile, x:x + tile])
+            decoded_tile = cv2.imdecode(np.frombuffer(tile_payload, np.uint8), cv2.IMREAD_COLOR)
+            self.reference[y:y + decoded_tile.shape[0], x:x + decoded_tile.shape[1]] = decoded_tile
+            parts.append(OOO_TILE_ENTRY.pack(col, row, len(tile_payload)))
+            parts.append(tile_payload)
+        
+        self.stats['patches'] += 1
+        self.stats['tiles'] += len(changed)
+        return b''.join(parts)
+
 class VideoEncoder:
-    def __init__(self):
+    def __init__(self, container_format='v2', workers=1, queue_depth=8, delta=False, delta_threshold=4.0, keyframe_interval=120,
+                 proxy=False, thumbnail_interval=0):
         self.supported_formats = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
+        self.container_format = container_format
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.delta = delta
+        self.delta_threshold = delta_threshold
+        self.keyframe_interval = keyframe_interval
+        self.proxy = proxy
+        self.thumbnail_interval = thumbnail_interval
     
     def clean_filename(self, filename):
         cleaned = re.sub(r'[<>:"/\\|?*]', '_', filename)
@@ -215,6 +387,186 @@ class VideoEncoder:
         print(f"Frames extracted: {frame_count}")
         return frames_data, frame_count, fps
 
+    def encode_jpeg(self, frame, quality=90):
+        success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not success:
+            raise ValueError("JPEG encoding failed")
+        return buffer.tobytes()
+    
+    def proxy_size(self, shape):
+        return max(1, round(shape[1] * PROXY_SCALE)), max(1, round(shape[0] * PROXY_SCALE))
+    
+    def thumbnail_size(self, shape):
+        width = min(THUMBNAIL_WIDTH, shape[1])
+        return width, max(1, round(shape[0] * width / shape[1]))
+    
+    def encode_side_tracks(self, frame, frame_number):
+        """Returns [(track, JPEG bytes)] for the proxy and thumbnail tracks of one frame"""
+        payloads = []
+        if self.proxy:
+            proxy = cv2.resize(frame, self.proxy_size(frame.shape), interpolation=cv2.INTER_AREA)
+            payloads.append(('proxy', self.encode_jpeg(proxy, PROXY_QUALITY)))
+        if self.thumbnail_interval and frame_number % self.thumbnail_interval == 0:
+            thumbnail = cv2.resize(frame, self.thumbnail_size(frame.shape), interpolation=cv2.INTER_AREA)
+            payloads.append(('thumbnails', self.encode_jpeg(thumbnail, THUMBNAIL_QUALITY)))
+        return payloads
+    
+    def encode_frame(self, frame, frame_number):
+        return self.encode_jpeg(frame), self.encode_side_tracks(frame, frame_number)
+    
+    def track_metadata(self, shape):
+        tracks = {}
+        if self.proxy:
+            width, height = self.proxy_size(shape)
+            tracks['proxy'] = {'resolution': f"{width}x{height}", 'scale': PROXY_SCALE, 'quality': PROXY_QUALITY}
+        if self.thumbnail_interval:
+            width, height = self.thumbnail_size(shape)
+            tracks['thumbnails'] = {'resolution': f"{width}x{height}", 'interval': self.thumbnail_interval,
+                                    'quality': THUMBNAIL_QUALITY}
+        return tracks
+    
+    def iter_encoded_frames(self, cap):
+        """Yields (frame shape, JPEG bytes, side track payloads) for every frame of cap, in order.
+        
+        With more than one worker this runs as a pipeline: a reader thread
+        feeds a bounded queue, a thread pool compresses the frames and the
+        caller consumes results in source order.
+        """
+        if self.workers <= 1:
+            frame_number = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield (frame.shape, *self.encode_frame(frame, frame_number))
+                frame_number += 1
+            return
+        
+        frame_queue = queue.Queue(maxsize=self.queue_depth)
+        stop_event = threading.Event()
+        
+        def read_frames():
+            try:
+                while not stop_event.is_set():
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    while not stop_event.is_set():
+                        try:
+                            frame_queue.put(frame, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+            finally:
+                frame_queue.put(None)
+        
+        reader_thread = threading.Thread(target=read_frames, daemon=True)
+        reader_thread.start()
+        pending = deque()
+        frame_number = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while True:
+                    frame = frame_queue.get()
+                    if frame is None:
+                        break
+                    pending.append((frame.shape, executor.submit(self.encode_frame, frame, frame_number)))
+                    frame_number += 1
+                    if len(pending) >= self.queue_depth:
+                        shape, future = pending.popleft()
+                        yield (shape, *future.result())
+                while pending:
+                    shape, future = pending.popleft()
+                    yield (shape, *future.result())
+        finally:
+            stop_event.set()
+            while reader_thread.is_alive():
+                try:
+                    frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            reader_thread.join()
+    
+    def iter_delta_frames(self, cap, delta_encoder):
+        """Delta mode needs each frame's predecessor, so it always runs serially"""
+        frame_number = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame.shape, delta_encoder.encode(frame), self.encode_side_tracks(frame, frame_number)
+            frame_number += 1
+    
+    def encode_frames_streaming(self, video_path, output_path, on_frame=None):
+        """Encodes video_path into a v2 container; on_frame(frame_count) is called after each frame is written"""
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video_path}")
+        
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        resolution = '0x0'
+        frame_count = 0
+        
+        print(f"Video properties: {total_frames} frames, {fps:.2f} FPS")
+        
+        delta_encoder = None
+        if self.delta:
+            delta_encoder = DeltaFrameEncoder(threshold=self.delta_threshold, keyframe_interval=self.keyframe_interval)
+            frames = self.iter_delta_frames(cap, delta_encoder)
+            print(f"Delta mode: threshold {self.delta_threshold}, keyframe every {self.keyframe_interval} frames")
+        else:
+            frames = self.iter_encoded_frames(cap)
+            if self.workers > 1:
+                print(f"Pipelined mode: {self.workers} workers, queue depth {self.queue_depth}")
+        if self.proxy:
+            print(f"Proxy track: {PROXY_SCALE:g} scale, JPEG quality {PROXY_QUALITY}")
+        if self.thumbnail_interval:
+            print(f"Thumbnails: every {self.thumbnail_interval} frames, {THUMBNAIL_WIDTH}px wide")
+        
+        writer = OooVideoWriter(output_path)
+        track_metadata = {}
+        try:
+            for shape, payload, side_payloads in frames:
+                writer.add_frame(payload)
+                for track, side_payload in side_payloads:
+                    writer.add_frame(side_payload, track)
+                
+                if frame_count == 0:
+                    resolution = f"{shape[1]}x{shape[0]}"
+                    track_metadata = self.track_metadata(shape)
+                frame_count += 1
+                if on_frame:
+                    on_frame(frame_count)
+                if frame_count % 30 == 0 and total_frames > 0:
+                    progress = (frame_count / total_frames) * 100
+                    print(f"Processing: {frame_count}/{total_frames} frames ({progress:.1f}%)")
+            
+            metadata = {'resolution': resolution, 'fps': fps}
+            if delta_encoder:
+                metadata['delta_encoding'] = {
+                    'tile_size': delta_encoder.tile_size,
+                    'threshold': delta_encoder.threshold,
+                    'pixel_threshold': delta_encoder.pixel_threshold,
+                    'keyframe_interval': delta_encoder.keyframe_interval
+                }
+            writer.close(metadata, track_metadata)
+        except Exception:
+            writer.abort()
+            raise
+        finally:
+            # Stops and joins the pipeline's reader thread before the capture is released under it
+            frames.close()
+            cap.release()
+        
+        print(f"Frames encoded: {frame_count}")
+        if delta_encoder:
+            stats = delta_encoder.stats
+            print(f"Delta frames: {stats['keyframes']} keyframes, {stats['repeats']} repeated, "
+                  f"{stats['patches']} patched ({stats['tiles']} tiles)")
+        print(f"Encoded data saved to: {output_path}")
+        return frame_count, fps
+    
     def save_encoded_data(self, frames_data, output_path, original_fps):
         video_data = {
             'metadata': {
@@ -242,14 +594,23 @@ class VideoEncoder:
             temp_video_path = os.path.join(src_dir, 'temp_video.mp4')
             video_path = self.download_video(video_source, temp_video_path)
             
-            print("Extracting frames...")
-            frames_data, total_frames, fps = self.extract_frames(video_path)
+            output_file = os.path.join(src_dir, f'{original_name}.ooo')
+            
+            if self.container_format == 'v1':
+                print("Extracting frames...")
+                frames_data, total_frames, fps = self.extract_frames(video_path)
             
-            if total_frames == 0:
-                raise ValueError("No frames could be extracted")
+                if total_frames == 0:
+                    raise ValueError("No frames could be extracted")
             
-            output_file = os.path.join(src_dir, f'{original_name}.ooo')
-            self.save_encoded_data(frames_data, output_file, fps)
+                self.save_encoded_data(frames_data, output_file, fps)
+            else:
+                print("Encoding frames...")
+                total_frames, fps = self.encode_frames_streaming(video_path, output_file)
+                
+                if total_frames == 0:
+                    os.remove(output_file)
+                    raise ValueError("No frames could be extracted")
             
             if video_source.startswith(('http://', 'https://')) and os.path.exists(temp_video_path):
                 os.remove(temp_video_path)
@@ -306,8 +667,37 @@ def select_video_source():
         
         return url
 
+def parse_int_arg(argv, name, default):
+    if name not in argv:
+        return default
+    try:
+        return max(1, int(argv[argv.index(name) + 1]))
+    except (IndexError, ValueError):
+        print(f"Invalid {name} value, using {default}")
+        return default
+
+def parse_optional_int_arg(argv, name, default):
+    """Reads a flag whose value may be left out ('--thumbnails' or '--thumbnails 120'); returns 0 when the flag is absent"""
+    if name not in argv:
+        return 0
+    index = argv.index(name) + 1
+    if index >= len(argv) or argv[index].startswith('--'):
+        return default
+    try:
+        return max(1, int(argv[index]))
+    except ValueError:
+        print(f"Invalid {name} value, using {default}")
+        return default
+
 def main():
-    encoder = VideoEncoder()
+    encoder = VideoEncoder(
+        workers=parse_int_arg(sys.argv, '--workers', 1),
+        queue_depth=parse_int_arg(sys.argv, '--queue-depth', 8),
+        delta='--delta' in sys.argv,
+        keyframe_interval=parse_int_arg(sys.argv, '--keyframe-interval', 120),
+        proxy='--proxy' in sys.argv,
+        thumbnail_interval=parse_optional_int_arg(sys.argv, '--thumbnails', 300)
+    )
     
     print("=== VIDEO ENCODER ===")
     
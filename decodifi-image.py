@@ -1,9 +1,50 @@
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageEnhance, ImageFilter
 import zlib
+import lzma
+import bz2
 import base64
 import io
+import struct
+import tempfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OOO_TEXT_MAGIC = b"#OOO1 "
+OOO_BINARY_MAGIC = b'\x89OOO'
+OOO_BINARY_HEADER = struct.Struct('<4sBH')
+RAW_EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+# Paquetes: cabecera, los .ooo completos uno tras otro, índice de entradas
+# (offset, longitud, crc32, nombre) y un pie que apunta al índice
+OOO_PACK_EXTENSION = ".ooopack"
+OOO_PACK_MAGIC = b'\x89OOP'
+OOO_PACK_HEADER = struct.Struct('<4sB')
+OOO_PACK_ENTRY = struct.Struct('<QQIH')
+OOO_PACK_FOOTER = struct.Struct('<QQ4s')
+OOO_PACK_END = b'OOPE'
+# El modo streaming procesa bloques de este tamaño; se activa solo por encima de STREAM_THRESHOLD
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_THRESHOLD = 64 * 1024 * 1024
+# Factores de mejora compartidos por los motores PIL y numpy
+CONTRAST_FACTOR = 1.2
+BRIGHTNESS_FACTOR = 1.1
+COLOR_FACTOR = 1.15
+ENHANCE_BACKENDS = ('pil', 'numpy')
+# Diferencia máxima por canal aceptada entre el motor numpy y PIL
+ENHANCE_TOLERANCE = 1
+# Filas por franja en el motor numpy; mantiene los temporales en caché
+ENHANCE_STRIP_ROWS = 64
 
 def enhance_image(img):
     """Mejora la imagen aplicando diferentes filtros y ajustes"""
@@ -13,15 +54,15 @@ def enhance_image(img):
         
         # Mejorar contraste
         enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.2)
+        img = enhancer.enhance(CONTRAST_FACTOR)
         
         # Mejorar brillo
         enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(1.1)
+        img = enhancer.enhance(BRIGHTNESS_FACTOR)
         
         # Mejorar saturación
         enhancer = ImageEnhance.Color(img)
-        img = enhancer.enhance(1.15)
+        img = enhancer.enhance(COLOR_FACTOR)
         
         # Reducir ruido
         img = img.filter(ImageFilter.SMOOTH)
@@ -31,42 +72,525 @@ def enhance_image(img):
         print(f"Warning: Could not enhance image: {e}")
         return img
 
-def ooo_to_image(input_path, output_dir, enhance=False):
+def filter_rows(source, target, top, bottom, center, neighbor, scale):
+    """Aplica a las filas [top, bottom) un kernel 3x3 con un peso para el centro y otro para los vecinos.
+
+    Es la forma de SHARPEN y SMOOTH; se calcula en int16 y redondea igual que
+    PIL. La primera y la última columna no se tocan (PIL las copia sin filtrar).
+    """
+    if bottom <= top:
+        return
+    pixels = source[top - 1:bottom + 1].astype(np.int16)
+    rows = pixels[:-2] + pixels[1:-1] + pixels[2:]
+    inner = rows[:, :-2] + rows[:, 1:-1] + rows[:, 2:]
+    if neighbor != 1:
+        inner *= neighbor
+    inner += (center - neighbor) * pixels[1:-1, 1:-1]
+    # floor(x / scale + 0.5) en aritmética entera
+    inner *= 2
+    inner += scale
+    inner //= 2 * scale
+    np.clip(inner, 0, 255, out=inner)
+    target[top:bottom, 1:-1] = inner
+
+def luminance(rgb):
+    """Conversión a L con los mismos pesos enteros que PIL"""
+    gray = rgb[..., 0] * np.int32(19595)
+    gray += rgb[..., 1] * np.int32(38470)
+    gray += rgb[..., 2] * np.int32(7471)
+    gray += 32768
+    gray >>= 16
+    return gray
+
+def blend_table(degenerate, factor):
+    """Tabla de 256 valores para degenerate + factor * (x - degenerate), con el redondeo de Image.blend"""
+    values = np.arange(256, dtype=np.float32)
+    blended = np.float32(degenerate) + np.float32(factor) * (values - np.float32(degenerate))
+    return np.floor(np.clip(blended, 0, 255)).astype(np.uint8)
+
+def enhance_image_numpy(img):
+    """Mismo resultado que enhance_image con una sola conversión a numpy.
+
+    La imagen se recorre por franjas de ENHANCE_STRIP_ROWS filas para que los
+    temporales quepan en caché: una pasada aplica SHARPEN y acumula la
+    luminancia media; la siguiente aplica contraste, brillo y saturación con
+    tablas y después SMOOTH. El contraste y el brillo se combinan en una sola
+    tabla de 256 valores y la saturación usa una tabla indexada por (gris, valor).
+    """
+    if np is None:
+        raise ImportError("The numpy enhancement backend requires numpy")
     try:
-        with open(input_path, 'r') as f:
-            encoded_data = f.read()
+        if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+            has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+            img = img.convert('RGBA' if has_alpha else 'RGB')
 
-        decoded_data = base64.b64decode(encoded_data)
-        decompressed_data = zlib.decompress(decoded_data)
+        source = np.asarray(img)
+        height, width = source.shape[:2]
+        if height < 3 or width < 3:
+            return enhance_image(img)
+        is_color = img.mode in ('RGB', 'RGBA')
 
-        img = Image.open(io.BytesIO(decompressed_data))
-        
-        # Mejorar la imagen si se solicita
-        if enhance:
+        def color_channels(pixels):
+            # El alfa no cambia con contraste, brillo ni saturación
+            if img.mode == 'L':
+                return pixels
+            return pixels[..., :3] if is_color else pixels[..., 0]
+
+        # Mejorar nitidez (el alfa también se filtra, como en PIL)
+        sharpened = source.copy()
+        luminance_sum = 0
+        for top in range(0, height, ENHANCE_STRIP_ROWS):
+            bottom = min(top + ENHANCE_STRIP_ROWS, height)
+            filter_rows(source, sharpened, max(top, 1), min(bottom, height - 1), 32, -2, 16)
+            strip = color_channels(sharpened[top:bottom])
+            luminance_sum += int(luminance(strip).sum() if is_color else strip.sum(dtype=np.int64))
+        mean = int(luminance_sum / (height * width) + 0.5)
+
+        # Contraste y brillo en una tabla; saturación con tabla [gris, valor]
+        tone_table = blend_table(0, BRIGHTNESS_FACTOR)[blend_table(mean, CONTRAST_FACTOR)]
+        values = np.arange(256, dtype=np.float32)
+        color_table = np.floor(np.clip(
+            values[:, None] + np.float32(COLOR_FACTOR) * (values[None, :] - values[:, None]), 0, 255
+        )).astype(np.uint8).ravel()
+
+        for top in range(0, height, ENHANCE_STRIP_ROWS):
+            color = color_channels(sharpened[top:top + ENHANCE_STRIP_ROWS])
+            color[...] = tone_table[color]
+            if is_color:
+                index = luminance(color).astype(np.uint16)
+                index <<= 8
+                index = index[..., None] | color
+                color[...] = color_table[index]
+
+        # Reducir ruido
+        result = sharpened.copy()
+        for top in range(1, height - 1, ENHANCE_STRIP_ROWS):
+            filter_rows(sharpened, result, top, min(top + ENHANCE_STRIP_ROWS, height - 1), 5, 1, 13)
+        return Image.fromarray(result)
+    except Exception as e:
+        print(f"Warning: Could not enhance image: {e}")
+        return img
+
+ENHANCERS = {'pil': enhance_image, 'numpy': enhance_image_numpy}
+
+def compare_enhance_backends(img):
+    """Aplica ambos motores a la imagen y devuelve tiempos y diferencias por canal"""
+    start = time.perf_counter()
+    pil_pixels = np.asarray(enhance_image(img), dtype=np.int16)
+    pil_time = time.perf_counter() - start
+    start = time.perf_counter()
+    numpy_pixels = np.asarray(enhance_image_numpy(img), dtype=np.int16)
+    numpy_time = time.perf_counter() - start
+    if pil_pixels.shape != numpy_pixels.shape:
+        raise ValueError(f"Backends returned different shapes: {pil_pixels.shape} vs {numpy_pixels.shape}")
+    diff = np.abs(pil_pixels - numpy_pixels)
+    return {
+        'pil_time': pil_time,
+        'numpy_time': numpy_time,
+        'max_diff': int(diff.max()),
+        'mean_diff': float(diff.mean())
+    }
+
+def decompress_payload(data, codec):
+    if codec == 'store':
+        return data
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'lzma':
+        return lzma.decompress(data)
+    if codec == 'bz2':
+        return bz2.decompress(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("This file uses zstd; install the zstandard package to decode it")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"Unsupported codec: {codec}")
+
+def make_decompressor(codec):
+    if codec == 'zlib':
+        return zlib.decompressobj()
+    if codec == 'lzma':
+        return lzma.LZMADecompressor()
+    if codec == 'bz2':
+        return bz2.BZ2Decompressor()
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("This file uses zstd; install the zstandard package to decode it")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unsupported codec: {codec}")
+
+def parse_header_fields(header):
+    return dict(item.split('=', 1) for item in header.decode('ascii').strip().split(';') if item)
+
+def parse_ooo_data(file_data):
+    """Devuelve (campos de cabecera, bytes de la imagen) de un archivo .ooo binario o de texto"""
+    if file_data.startswith(OOO_BINARY_MAGIC):
+        _, version, header_length = OOO_BINARY_HEADER.unpack_from(file_data, 0)
+        if version != 1:
+            raise ValueError(f"Unsupported binary .ooo version: {version}")
+        header_end = OOO_BINARY_HEADER.size + header_length
+        fields = parse_header_fields(file_data[OOO_BINARY_HEADER.size:header_end])
+        data = file_data[header_end:]
+    elif file_data.startswith(OOO_TEXT_MAGIC):
+        header_line, body = file_data.split(b'\n', 1)
+        fields = parse_header_fields(header_line[len(OOO_TEXT_MAGIC):])
+        data = base64.b64decode(body)
+    else:
+        # Formato original sin cabecera: base64(zlib(PNG))
+        fields = {'payload': 'png', 'codec': 'zlib'}
+        data = base64.b64decode(file_data)
+
+    return fields, decompress_payload(data, fields.get('codec', 'zlib'))
+
+def iter_file_chunks(f, prefix=b''):
+    if prefix:
+        yield prefix
+    yield from iter(lambda: f.read(STREAM_CHUNK_SIZE), b'')
+
+def iter_base64_chunks(chunks):
+    """Decodifica base64 por bloques, ignorando saltos de línea y guardando el resto para alinear a 4"""
+    carry = b''
+    for chunk in chunks:
+        data = carry + b''.join(chunk.split())
+        aligned = len(data) - len(data) % 4
+        if aligned:
+            yield base64.b64decode(data[:aligned])
+        carry = data[aligned:]
+    if carry:
+        yield base64.b64decode(carry)
+
+def iter_decompressed_chunks(chunks, codec):
+    if codec == 'store':
+        yield from chunks
+        return
+    decompressor = make_decompressor(codec)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    if hasattr(decompressor, 'flush'):
+        data = decompressor.flush()
+        if data:
+            yield data
+
+def open_ooo_stream(f):
+    """Lee solo la cabecera de un .ooo abierto y devuelve (campos, iterador de bloques de la imagen)"""
+    start = f.read(len(OOO_TEXT_MAGIC))
+    if start.startswith(OOO_BINARY_MAGIC):
+        start += f.read(OOO_BINARY_HEADER.size - len(start))
+        _, version, header_length = OOO_BINARY_HEADER.unpack(start)
+        if version != 1:
+            raise ValueError(f"Unsupported binary .ooo version: {version}")
+        fields = parse_header_fields(f.read(header_length))
+        chunks = iter_file_chunks(f)
+    elif start == OOO_TEXT_MAGIC:
+        fields = parse_header_fields(f.readline())
+        chunks = iter_base64_chunks(iter_file_chunks(f))
+    else:
+        # Formato original sin cabecera: base64(zlib(PNG))
+        fields = {'payload': 'png', 'codec': 'zlib'}
+        chunks = iter_base64_chunks(iter_file_chunks(f, start))
+    return fields, iter_decompressed_chunks(chunks, fields.get('codec', 'zlib'))
+
+def write_chunks(chunks, output_path):
+    with open(output_path, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+def ooo_to_image_streaming(input_path, output_dir, enhance=False, verbose=True, backend='pil'):
+    """Decodifica por bloques para que la memoria no dependa del tamaño del archivo"""
+    original_name = os.path.splitext(os.path.basename(input_path))[0]
+    with open(input_path, 'rb') as f:
+        fields, chunks = open_ooo_stream(f)
+        if fields.get('payload') == 'raw':
+            extension = RAW_EXTENSIONS.get(fields.get('format'), '.bin')
+        else:
+            extension = '.png'
+
+        if not enhance:
+            # Sin mejora el PNG o los bytes originales se escriben directamente, sin pasar por PIL
+            output_path = os.path.join(output_dir, f"{original_name}{extension}")
+            write_chunks(chunks, output_path)
+            if verbose:
+                print(f"File restored and saved to {output_path}")
+            return output_path
+
+        temp_file = tempfile.NamedTemporaryFile(suffix=extension, dir=output_dir, delete=False)
+        temp_file.close()
+        try:
+            write_chunks(chunks, temp_file.name)
+            if verbose:
+                print("Enhancing image quality...")
+            with Image.open(temp_file.name) as source:
+                source.load()
+                img = ENHANCERS[backend](source)
+            output_path = os.path.join(output_dir, f"{original_name}.png")
+            img.save(output_path, format="PNG")
+            if verbose:
+                print(f"File converted and saved to {output_path}")
+            return output_path
+        finally:
+            os.remove(temp_file.name)
+
+def decode_ooo_file(input_path, output_dir, enhance=False, stream=False, verbose=True, backend='pil'):
+    """Decodifica un .ooo y devuelve la ruta de la imagen; los errores se propagan al llamador"""
+    if stream or os.path.getsize(input_path) > STREAM_THRESHOLD:
+        return ooo_to_image_streaming(input_path, output_dir, enhance, verbose, backend)
+
+    with open(input_path, 'rb') as f:
+        file_data = f.read()
+
+    original_name = os.path.splitext(os.path.basename(input_path))[0]
+    return decode_ooo_bytes(file_data, original_name, output_dir, enhance, verbose, backend)
+
+def decode_ooo_bytes(file_data, original_name, output_dir, enhance=False, verbose=True, backend='pil'):
+    fields, image_data = parse_ooo_data(file_data)
+
+    # Los bytes originales se restauran tal cual si no hay que mejorar la imagen
+    if fields.get('payload') == 'raw' and not enhance:
+        extension = RAW_EXTENSIONS.get(fields.get('format'), '.bin')
+        output_path = os.path.join(output_dir, f"{original_name}{extension}")
+        with open(output_path, 'wb') as f:
+            f.write(image_data)
+        if verbose:
+            print(f"File restored and saved to {output_path}")
+        return output_path
+
+    img = Image.open(io.BytesIO(image_data))
+    
+    # Mejorar la imagen si se solicita
+    if enhance:
+        if verbose:
             print("Enhancing image quality...")
-            img = enhance_image(img)
+        img = ENHANCERS[backend](img)
 
-        original_name = os.path.splitext(os.path.basename(input_path))[0]
-        output_path = os.path.join(output_dir, f"{original_name}.png")
+    output_path = os.path.join(output_dir, f"{original_name}.png")
 
-        img.save(output_path, format="PNG")
+    img.save(output_path, format="PNG")
+    if verbose:
         print(f"File converted and saved to {output_path}")
+    return output_path
 
+class OooPackReader:
+    """Acceso aleatorio a un .ooopack: solo se leen el pie y el índice, y cada entrada con un seek"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            magic, version = OOO_PACK_HEADER.unpack(self.file.read(OOO_PACK_HEADER.size))
+            if magic != OOO_PACK_MAGIC:
+                raise ValueError(f"Not a {OOO_PACK_EXTENSION} file: {path}")
+            if version != 1:
+                raise ValueError(f"Unsupported {OOO_PACK_EXTENSION} version: {version}")
+
+            file_size = self.file.seek(0, os.SEEK_END)
+            self.file.seek(file_size - OOO_PACK_FOOTER.size)
+            index_offset, count, end = OOO_PACK_FOOTER.unpack(self.file.read(OOO_PACK_FOOTER.size))
+            if end != OOO_PACK_END:
+                raise ValueError(f"Truncated {OOO_PACK_EXTENSION} file (missing index): {path}")
+            self.file.seek(index_offset)
+            index = self.file.read(file_size - OOO_PACK_FOOTER.size - index_offset)
+        except Exception:
+            self.file.close()
+            raise
+
+        # nombre -> (offset, longitud, crc32), en el orden del paquete
+        self.entries = {}
+        position = 0
+        for _ in range(count):
+            offset, length, checksum, name_length = OOO_PACK_ENTRY.unpack_from(index, position)
+            position += OOO_PACK_ENTRY.size
+            name = index[position:position + name_length].decode('utf-8')
+            position += name_length
+            self.entries[name] = (offset, length, checksum)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, name):
+        if name not in self.entries:
+            raise ValueError(f"No entry named {name} in {self.path}")
+        offset, length, checksum = self.entries[name]
+        self.file.seek(offset)
+        data = self.file.read(length)
+        if zlib.crc32(data) != checksum:
+            raise ValueError(f"Checksum mismatch for {name}, the pack is corrupted")
+        return data
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def unique_name(stem, taken, first_counter=2):
+    """Devuelve stem, o stem_N con el primer N libre comparando sin distinguir mayúsculas, y lo marca como usado"""
+    candidate = stem
+    counter = first_counter
+    while candidate.lower() in taken:
+        candidate = f"{stem}_{counter}"
+        counter += 1
+    taken.add(candidate.lower())
+    return candidate
+
+def plan_pack_output_names(entry_names):
+    """Asigna a cada entrada del paquete una ruta de salida sin extensión y única.
+    La primera en orden conserva su nombre base; las que lo repiten (im0.jpg, im0.png)
+    reciben la extensión original y, si hace falta, un contador: im0_png, im0_png_2"""
+    names = {}
+    taken = set()
+    renamed = []
+    for name in sorted(entry_names):
+        base = os.path.splitext(name)[0]
+        if base.lower() in taken:
+            renamed.append(name)
+        else:
+            taken.add(base.lower())
+            names[name] = base
+    for name in renamed:
+        base, extension = os.path.splitext(name)
+        names[name] = unique_name(f"{base}_{extension[1:].lower()}", taken)
+    return names
+
+def decode_pack_entry(reader, name, output_dir, enhance=False, verbose=True, backend='pil', output_name=None):
+    # Los nombres son rutas relativas; se rechazan las que saldrían de output_dir
+    relative_dir = os.path.normpath(os.path.dirname(name)) if os.path.dirname(name) else ''
+    if os.path.isabs(name) or relative_dir.split(os.sep)[0] == '..':
+        raise ValueError(f"Unsafe entry name in pack: {name}")
+    target_dir = os.path.join(output_dir, relative_dir)
+    os.makedirs(target_dir, exist_ok=True)
+    # output_name viene de plan_pack_output_names y solo cambia el nombre base, no la carpeta
+    original_name = os.path.basename(output_name or os.path.splitext(name)[0])
+    return decode_ooo_bytes(reader.read(name), original_name, target_dir, enhance, verbose, backend)
+
+def ooo_to_image(input_path, output_dir, enhance=False, stream=False, backend='pil'):
+    try:
+        return decode_ooo_file(input_path, output_dir, enhance, stream, backend=backend)
     except Exception as e:
         print(f"Error processing {input_path}: {e}")
 
-def process_ooo_files(input_path, enhance=False):
+def decode_ooo_task(task):
+    """Punto de entrada de cada proceso del pool; devuelve un dict en lugar de imprimir"""
+    input_path, output_dir, enhance, stream, backend = task
+    try:
+        output_path = decode_ooo_file(input_path, output_dir, enhance, stream, verbose=False, backend=backend)
+        return {'path': input_path, 'ok': True, 'output': output_path,
+                'bytes_in': os.path.getsize(input_path), 'bytes_out': os.path.getsize(output_path)}
+    except Exception as e:
+        return {'path': input_path, 'ok': False, 'error': str(e), 'bytes_in': 0, 'bytes_out': 0}
+
+# Cada proceso del pool abre el paquete una vez y reutiliza el índice
+_open_packs = {}
+
+def decode_pack_task(task):
+    pack_path, name, output_name, output_dir, enhance, backend = task
+    try:
+        reader = _open_packs.get(pack_path)
+        if reader is None:
+            reader = _open_packs[pack_path] = OooPackReader(pack_path)
+        output_path = decode_pack_entry(reader, name, output_dir, enhance, verbose=False, backend=backend,
+                                        output_name=output_name)
+        return {'path': name, 'ok': True, 'output': output_path,
+                'bytes_in': reader.entries[name][1], 'bytes_out': os.path.getsize(output_path)}
+    except Exception as e:
+        return {'path': name, 'ok': False, 'error': str(e), 'bytes_in': 0, 'bytes_out': 0}
+
+def decode_batch(tasks, workers, task_function=decode_ooo_task):
+    """Decodifica los .ooo en un pool de procesos para que la mejora use todos los núcleos"""
+    chunksize = max(1, min(16, len(tasks) // (workers * 4)))
+    summary = {'decoded': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'errors': []}
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for done, result in enumerate(executor.map(task_function, tasks, chunksize=chunksize), 1):
+            if result['ok']:
+                summary['decoded'] += 1
+                summary['bytes_in'] += result['bytes_in']
+                summary['bytes_out'] += result['bytes_out']
+            else:
+                summary['failed'] += 1
+                summary['errors'].append((result['path'], result['error']))
+            if done % 1000 == 0:
+                print(f"Progress: {done}/{len(tasks)} files")
+
+    summary['elapsed'] = time.perf_counter() - start_time
+    return summary
+
+def print_batch_summary(summary, output_dir):
+    elapsed = summary['elapsed']
+    total = summary['decoded'] + summary['failed']
+    print(f"Conversion completed in {elapsed:.1f}s -> {output_dir}")
+    print(f"  Decoded:   {summary['decoded']}")
+    print(f"  Failed:    {summary['failed']}")
+    print(f"  Bytes in:  {summary['bytes_in'] / (1024 * 1024):.2f} MB")
+    print(f"  Bytes out: {summary['bytes_out'] / (1024 * 1024):.2f} MB")
+    if elapsed > 0:
+        print(f"  Throughput: {total / elapsed:.1f} files/s, "
+              f"{summary['bytes_in'] / (1024 * 1024) / elapsed:.2f} MB/s")
+    for path, error in summary['errors'][:10]:
+        print(f"  Error processing {path}: {error}")
+    if len(summary['errors']) > 10:
+        print(f"  ... and {len(summary['errors']) - 10} more errors")
+
+def list_pack(pack_path):
+    with OooPackReader(pack_path) as reader:
+        total = 0
+        for name, (offset, length, checksum) in reader.entries.items():
+            print(f"  {length:>12,} bytes  crc32 {checksum:08x}  {name}")
+            total += length
+        print(f"{len(reader)} entries, {total / (1024 * 1024):.2f} MB")
+
+def process_pack(pack_path, src_dir, enhance=False, workers=1, backend='pil', extract_name=None):
+    """Extrae una entrada (extract_name) o todas las del paquete en src/<nombre del paquete>"""
+    pack_name = os.path.splitext(os.path.basename(pack_path))[0]
+    output_dir = os.path.join(src_dir, pack_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with OooPackReader(pack_path) as reader:
+        # Se planifican todos los nombres antes de extraer para que ninguna salida pise a otra
+        output_names = plan_pack_output_names(reader.entries)
+        if extract_name is not None:
+            decode_pack_entry(reader, extract_name, output_dir, enhance, backend=backend,
+                              output_name=output_names.get(extract_name))
+            return
+
+        if workers > 1:
+            tasks = [(pack_path, name, output_names[name], output_dir, enhance, backend) for name in reader.entries]
+            print(f"Extracting {len(tasks)} entries with {workers} workers...")
+            print_batch_summary(decode_batch(tasks, workers, decode_pack_task), output_dir)
+            return
+
+        converted_count = 0
+        for name in reader.entries:
+            try:
+                decode_pack_entry(reader, name, output_dir, enhance, backend=backend, output_name=output_names[name])
+                converted_count += 1
+            except Exception as e:
+                print(f"Error processing {name}: {e}")
+
+    print(f"Extraction completed. {converted_count} files extracted to {output_dir}")
+
+def process_ooo_files(input_path, enhance=False, stream=False, workers=1, backend='pil', extract_name=None, list_only=False):
     try:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         src_dir = os.path.join(script_dir, "src")
         if not os.path.exists(src_dir):
             os.makedirs(src_dir)
 
-        if os.path.isfile(input_path):
+        if os.path.isfile(input_path) and input_path.lower().endswith(OOO_PACK_EXTENSION):
+            if list_only:
+                list_pack(input_path)
+            else:
+                process_pack(input_path, src_dir, enhance, workers, backend, extract_name)
+
+        elif os.path.isfile(input_path):
             if input_path.lower().endswith(".ooo"):
-                ooo_to_image(input_path, src_dir, enhance)
+                ooo_to_image(input_path, src_dir, enhance, stream, backend)
             else:
-                print("Unsupported file format. Use: .ooo")
+                print(f"Unsupported file format. Use: .ooo or {OOO_PACK_EXTENSION}")
 
         elif os.path.isdir(input_path):
             folder_name = os.path.basename(os.path.normpath(input_path))
@@ -74,12 +598,19 @@ def process_ooo_files(input_path, enhance=False):
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
 
+            if workers > 1:
+                tasks = [(os.path.join(input_path, filename), output_dir, enhance, stream, backend)
+                         for filename in os.listdir(input_path) if filename.lower().endswith(".ooo")]
+                print(f"Decoding {len(tasks)} files with {workers} workers...")
+                print_batch_summary(decode_batch(tasks, workers), output_dir)
+                return
+
             converted_count = 0
 
             for filename in os.listdir(input_path):
                 if filename.lower().endswith(".ooo"):
                     ooo_path = os.path.join(input_path, filename)
-                    ooo_to_image(ooo_path, output_dir, enhance)
+                    ooo_to_image(ooo_path, output_dir, enhance, stream, backend)
                     converted_count += 1
 
             print(f"Conversion completed. {converted_count} files converted to {output_dir}")
@@ -90,15 +621,90 @@ def process_ooo_files(input_path, enhance=False):
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def validate_enhance_backends(input_path):
+    """Compara los motores numpy y PIL sobre uno o varios .ooo e informa si están dentro de la tolerancia"""
+    if os.path.isdir(input_path):
+        paths = [os.path.join(input_path, name) for name in sorted(os.listdir(input_path)) if name.lower().endswith(".ooo")]
+    else:
+        paths = [input_path]
+
+    pil_total = numpy_total = 0.0
+    failures = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                _, image_data = parse_ooo_data(f.read())
+            with Image.open(io.BytesIO(image_data)) as img:
+                img.load()
+                result = compare_enhance_backends(img)
+        except Exception as e:
+            failures += 1
+            print(f"  {os.path.basename(path)}: error: {e}")
+            continue
+        pil_total += result['pil_time']
+        numpy_total += result['numpy_time']
+        status = "OK" if result['max_diff'] <= ENHANCE_TOLERANCE else "FAIL"
+        if status == "FAIL":
+            failures += 1
+        print(f"  {os.path.basename(path)}: {status} max diff {result['max_diff']}, mean diff {result['mean_diff']:.4f}, "
+              f"pil {result['pil_time'] * 1000:.1f} ms, numpy {result['numpy_time'] * 1000:.1f} ms")
+
+    if numpy_total > 0:
+        print(f"Total: pil {pil_total:.2f}s, numpy {numpy_total:.2f}s ({pil_total / numpy_total:.2f}x)")
+    print(f"{len(paths) - failures}/{len(paths)} images within tolerance ({ENHANCE_TOLERANCE})")
+    return failures == 0
+
+def parse_int_arg(argv, name, default):
+    if name not in argv:
+        return default
+    try:
+        return max(1, int(argv[argv.index(name) + 1]))
+    except (IndexError, ValueError):
+        print(f"Invalid {name} value, using {default}")
+        return default
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python ooo_decoder.py <ooo_file_or_folder> [--enhance]")
+        print("Usage: python ooo_decoder.py <ooo_file_or_folder> [--enhance] [--enhance-backend pil|numpy] [--stream] [--workers N]")
+        print("       python ooo_decoder.py <pack.ooopack> [--list] [--extract NAME] [--enhance] [--workers N]")
+        print("       python ooo_decoder.py <ooo_file_or_folder> --compare-backends")
         print("\nExamples:")
         print("  Single file:          python ooo_decoder.py \"image.ooo\"")
         print("  Single file enhanced: python ooo_decoder.py \"image.ooo\" --enhance")
         print("  Folder:               python ooo_decoder.py \"C:\\EncodedImages\"")
         print("  Folder enhanced:      python ooo_decoder.py \"C:\\EncodedImages\" --enhance")
+        print("  Parallel folder:      python ooo_decoder.py \"C:\\EncodedImages\" --enhance --workers 8")
+        print("  NumPy enhancement:    python ooo_decoder.py \"image.ooo\" --enhance --enhance-backend numpy")
+        print("  Pack contents:        python ooo_decoder.py \"Photos.ooopack\" --list")
+        print("  Pack single entry:    python ooo_decoder.py \"Photos.ooopack\" --extract \"sub/photo.jpg\"")
+        print("  Pack all entries:     python ooo_decoder.py \"Photos.ooopack\" --workers 8")
+        print("\n--stream decodes in fixed-size chunks (automatic above 64 MB) to bound memory use.")
+        print("--enhance-backend numpy runs the same enhancement in one NumPy pass; --compare-backends checks it against PIL.")
+    elif "--compare-backends" in sys.argv:
+        if np is None:
+            print("--compare-backends requires numpy")
+            sys.exit(1)
+        sys.exit(0 if validate_enhance_backends(sys.argv[1]) else 1)
     else:
         input_path = sys.argv[1]
         enhance = "--enhance" in sys.argv
-        process_ooo_files(input_path, enhance)
\ No newline at end of file
+        backend = 'pil'
+        if "--enhance-backend" in sys.argv:
+            backend_index = sys.argv.index("--enhance-backend") + 1
+            backend = sys.argv[backend_index] if backend_index < len(sys.argv) else ''
+            if backend not in ENHANCE_BACKENDS:
+                print(f"Invalid --enhance-backend value, use one of: {', '.join(ENHANCE_BACKENDS)}")
+                sys.exit(1)
+            if backend == 'numpy' and np is None:
+                print("The numpy enhancement backend requires numpy")
+                sys.exit(1)
+        extract_name = None
+        if "--extract" in sys.argv:
+            extract_index = sys.argv.index("--extract") + 1
+            if extract_index >= len(sys.argv):
+                print("--extract needs the name of a pack entry (see --list)")
+                sys.exit(1)
+            extract_name = sys.argv[extract_index]
+        process_ooo_files(input_path, enhance, stream="--stream" in sys.argv,
+                          workers=parse_int_arg(sys.argv, "--workers", 1), backend=backend,
+                          extract_name=extract_name, list_only="--list" in sys.argv)
\ No newline at end of file
@@ -5,9 +5,336 @@ import os
 import numpy as np
 from pathlib import Path
 import glob
+import mmap
+import struct
+import sys
+import time
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+OOO_MAGIC = b'OOOV'
+OOO_HEADER = struct.Struct('<4sHQQ')
+OOO_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4')])
+OOO_TILE_MAGIC = b'OOOT'
+OOO_TILE_HEADER = struct.Struct('<4sHI')
+OOO_TILE_ENTRY = struct.Struct('<HHI')
+JPEG_SOI = b'\xff\xd8'
+
+class OooVideoReader:
+    """Random-access frame reader for .ooo files.
+    
+    v2 containers are memory-mapped and their frame index is read straight
+    from the file, so opening costs the same for any video length and only
+    the requested JPEG payloads are touched. Legacy v1 JSON files are parsed
+    once and served from memory through the same interface.
+    
+    Delta-encoded files (see DeltaFrameEncoder in codifi-video.py) are
+    rebuilt from the nearest preceding keyframe; the last rebuilt frame is
+    cached so sequential access only applies one patch per frame.
+    
+    track selects a side track ('proxy' or 'thumbnails') instead of the
+    main frames. Side tracks are plain JPEGs; metadata then describes the
+    selected track (resolution, frame count, and fps / interval for
+    thumbnails) and the container's own metadata stays in container_metadata.
+    """
+    def __init__(self, path, track=None):
+        self.path = path
+        self.track = track
+        self.file = None
+        self.mm = None
+        self.legacy_frames = None
+        self.delta_lock = threading.Lock()
+        self.cached_index = None
+        self.cached_frame = None
+        
+        with open(path, 'rb') as file:
+            is_binary = file.read(len(OOO_MAGIC)) == OOO_MAGIC
+        
+        if is_binary:
+            self.file = open(path, 'rb')
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, metadata_offset, metadata_length = OOO_HEADER.unpack_from(self.mm, 0)
+            if version != 2:
+                self.close()
+                raise ValueError(f"Unsupported .ooo container version: {version}")
+            if metadata_offset == 0:
+                self.close()
+                raise ValueError("Incomplete .ooo file (metadata was never written)")
+            self.metadata = json.loads(self.mm[metadata_offset:metadata_offset + metadata_length].decode('utf-8'))
+            self.container_metadata = self.metadata
+            if track is not None:
+                self.metadata = self.select_track_metadata(track)
+            self.index = np.frombuffer(
+                self.mm, dtype=OOO_INDEX_DTYPE,
+                count=self.metadata['total_frames'],
+                offset=self.metadata['index_offset']
+            ).copy()
+        else:
+            if track is not None:
+                raise ValueError(f"Legacy JSON .ooo files have no '{track}' track")
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if 'metadata' not in data or 'frames' not in data:
+                raise ValueError("Invalid .ooo file structure")
+            self.metadata = self.container_metadata = data['metadata']
+            self.legacy_frames = [frame_info['data'] for frame_info in data['frames']]
+        
+        self.delta_encoded = 'delta_encoding' in self.metadata
+    
+    @property
+    def tracks(self):
+        return self.container_metadata.get('tracks', {})
+    
+    def select_track_metadata(self, track):
+        if track not in self.tracks:
+            self.close()
+            available = ', '.join(self.tracks) or 'none'
+            raise ValueError(f"This .ooo file has no '{track}' track (available: {available})")
+        track_info = self.tracks[track]
+        metadata = {key: value for key, value in self.container_metadata.items()
+                    if key not in ('tracks', 'delta_encoding')}
+        metadata.update(track_info)
+        if 'interval' in track_info:
+            metadata['fps'] = self.container_metadata.get('fps', 30) / track_info['interval']
+        return metadata
+    
+    def __len__(self):
+        if self.legacy_frames is not None:
+            return len(self.legacy_frames)
+        return len(self.index)
+    
+    def _normalize_index(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Frame index out of range: {i}")
+        return i
+    
+    def read_bytes(self, i):
+        i = self._normalize_index(i)
+        if self.legacy_frames is not None:
+            return base64.b64decode(self.legacy_frames[i])
+        offset = int(self.index[i]['offset'])
+        return self.mm[offset:offset + int(self.index[i]['length'])]
+    
+    def decode_jpeg(self, payload, i):
+        frame = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError(f"Frame {i} could not be decoded")
+        return frame
+    
+    def is_keyframe(self, i):
+        offset = int(self.index[i]['offset'])
+        return self.index[i]['length'] >= 2 and self.mm[offset:offset + 2] == JPEG_SOI
+    
+    def apply_tiles(self, frame, payload, i):
+        magic, tile_size, tile_count = OOO_TILE_HEADER.unpack_from(payload, 0)
+        if magic != OOO_TILE_MAGIC:
+            raise ValueError(f"Frame {i} has an unknown payload type")
+        position = OOO_TILE_HEADER.size
+        for _ in range(tile_count):
+            col, row, length = OOO_TILE_ENTRY.unpack_from(payload, position)
+            position += OOO_TILE_ENTRY.size
+            tile = self.decode_jpeg(payload[position:position + length], i)
+            position += length
+            y, x = row * tile_size, col * tile_size
+            frame[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+    
+    def reconstruct(self, i):
+        with self.delta_lock:
+            keyframe = i
+            while not self.is_keyframe(keyframe):
+                if keyframe == 0:
+                    raise ValueError(f"No keyframe found before frame {i}")
+                keyframe -= 1
+            
+            if self.cached_index is not None and keyframe <= self.cached_index <= i:
+                frame = self.cached_frame
+                start = self.cached_index + 1
+            else:
+                frame = self.decode_jpeg(self.read_bytes(keyframe), keyframe)
+                start = keyframe + 1
+            
+            for j in range(start, i + 1):
+                payload = self.read_bytes(j)
+                if payload:
+                    self.apply_tiles(frame, payload, j)
+            
+            self.cached_index = i
+            self.cached_frame = frame
+            return frame.copy()
+    
+    def decode(self, i):
+        i = self._normalize_index(i)
+        if self.delta_encoded and not self.is_keyframe(i):
+            return self.reconstruct(i)
+        return self.decode_jpeg(self.read_bytes(i), i)
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.decode(i) for i in range(*key.indices(len(self)))]
+        return self.decode(key)
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.decode(i)
+    
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class MjpegAviWriter:
+    """Muxes already-encoded JPEG frames into an AVI (MJPG) file without decoding them.
+    
+    Writes a plain AVI 1.0 file: header list, 'movi' list with one '00dc'
+    chunk per frame and an 'idx1' index. The RIFF size fields are 32-bit,
+    so output is limited to 4 GB.
+    """
+    MAX_RIFF_SIZE = 0xFFFFFFFF
+    
+    def __init__(self, output_path, width, height, fps):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps if fps and fps > 0 else 30
+        self.file = open(output_path, 'wb')
+        self.index = []
+        self.max_frame_size = 0
+        self.write_headers(0)
+        self.movi_list_offset = self.file.tell()
+        self.file.write(b'LIST' + struct.pack('<I', 0) + b'movi')
+    
+    def write_headers(self, total_frames):
+        rate_scale = 1000
+        rate = int(round(self.fps * rate_scale))
+        avih = struct.pack(
+            '<IIIIIIIIII16x',
+            int(round(1000000 / self.fps)), 0, 0, 0x10, total_frames, 0, 1,
+            self.max_frame_size, self.width, self.height
+        )
+        strh = struct.pack(
+            '<4s4sIHHIIIIIIIIhhhh',
+            b'vids', b'MJPG', 0, 0, 0, 0, rate_scale, rate, 0, total_frames,
+            self.max_frame_size, 0xFFFFFFFF, 0, 0, 0, self.width, self.height
+        )
+        strf = struct.pack(
+            '<IiiHH4sIiiII',
+            40, self.width, self.height, 1, 24, b'MJPG', self.width * self.height * 3, 0, 0, 0, 0
+        )
+        strl = b'strl' + self.chunk(b'strh', strh) + self.chunk(b'strf', strf)
+        hdrl = b'hdrl' + self.chunk(b'avih', avih) + self.chunk(b'LIST', strl)
+        self.file.write(b'RIFF' + struct.pack('<I', 0) + b'AVI ')
+        self.file.write(self.chunk(b'LIST', hdrl))
+    
+    def chunk(self, fourcc, data):
+        padding = b'\x00' if len(data) % 2 else b''
+        return fourcc + struct.pack('<I', len(data)) + data + padding
+    
+    def add_frame(self, jpeg_bytes):
+        size = len(jpeg_bytes)
+        if self.file.tell() + size + 8 + (len(self.index) + 1) * 16 > self.MAX_RIFF_SIZE:
+            raise ValueError("MJPEG passthrough output would exceed the 4 GB AVI limit")
+        offset = self.file.tell() - (self.movi_list_offset + 8)
+        self.file.write(b'00dc' + struct.pack('<I', size))
+        self.file.write(jpeg_bytes)
+        if size % 2:
+            self.file.write(b'\x00')
+        self.index.append((offset, size))
+        self.max_frame_size = max(self.max_frame_size, size)
+    
+    def close(self):
+        movi_end = self.file.tell()
+        index_data = b''.join(struct.pack('<4sIII', b'00dc', 0x10, offset, size) for offset, size in self.index)
+        self.file.write(self.chunk(b'idx1', index_data))
+        file_end = self.file.tell()
+        
+        self.file.seek(0)
+        self.write_headers(len(self.index))
+        self.file.seek(4)
+        self.file.write(struct.pack('<I', file_end - 8))
+        self.file.seek(self.movi_list_offset + 4)
+        self.file.write(struct.pack('<I', movi_end - self.movi_list_offset - 8))
+        self.file.close()
+    
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+class StageProfiler:
+    """Collects per-stage timings (thread-safe) and reports cumulative and percentile figures.
+    
+    Stages whose name ends in '_total' wrap other stages; they are reported
+    but left out of the total used for the share column.
+    """
+    def __init__(self):
+        self.timings = {}
+        self.lock = threading.Lock()
+    
+    def record(self, stage, seconds):
+        with self.lock:
+            if stage not in self.timings:
+                self.timings[stage] = array('d')
+            self.timings[stage].append(seconds)
+    
+    def run(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(stage, time.perf_counter() - start)
+    
+    def summary(self):
+        with self.lock:
+            timings = {stage: np.frombuffer(values, dtype=np.float64) * 1000 for stage, values in self.timings.items()}
+        grand_total = sum(float(values.sum()) for stage, values in timings.items() if not stage.endswith('_total'))
+        report = {}
+        for stage, values in timings.items():
+            total = float(values.sum())
+            report[stage] = {
+                'calls': len(values),
+                'total_ms': total,
+                'share_percent': (total / grand_total * 100) if grand_total > 0 else 0.0,
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p90_ms': float(np.percentile(values, 90)),
+                'p99_ms': float(np.percentile(values, 99)),
+                'max_ms': float(values.max())
+            }
+        return report
+    
+    def print_report(self):
+        report = self.summary()
+        if not report:
+            print("No profiling data recorded")
+            return
+        print(f"\nStage timing breakdown:")
+        print(f"   {'Stage':<22} {'Calls':>7} {'Total (s)':>10} {'Share':>7} {'Mean':>9} {'p50':>9} {'p90':>9} {'p99':>9}")
+        for stage, stats in sorted(report.items(), key=lambda item: item[1]['total_ms'], reverse=True):
+            print(f"   {stage:<22} {stats['calls']:>7} {stats['total_ms'] / 1000:>10.2f} "
+                  f"{stats['share_percent']:>6.1f}% {stats['mean_ms']:>7.2f}ms {stats['p50_ms']:>7.2f}ms "
+                  f"{stats['p90_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms")
+    
+    def export_json(self, output_path):
+        with open(output_path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+        print(f"Profiling report saved to: {output_path}")
 
 class VideoEnhancer:
     def __init__(self):
+        self.profiler = None
         self.enhancement_presets = {
             'original': {'brightness': 0, 'contrast': 1.0, 'sharpness': 1.0, 'saturation': 1.0},
             'standard': {'brightness': 15, 'contrast': 1.3, 'sharpness': 1.8, 'saturation': 1.2},
@@ -18,6 +345,11 @@ class VideoEnhancer:
             'custom': {'brightness': 15, 'contrast': 1.3, 'sharpness': 1.8, 'saturation': 1.2}
         }
     
+    def run_stage(self, stage, func, *args, **kwargs):
+        if self.profiler is None:
+            return func(*args, **kwargs)
+        return self.profiler.run(stage, func, *args, **kwargs)
+    
     def adjust_brightness_contrast(self, frame, brightness=0, contrast=1.0):
         if brightness == 0 and contrast == 1.0:
             return frame
@@ -46,11 +378,14 @@ class VideoEnhancer:
     def reduce_noise(self, frame):
         return cv2.bilateralFilter(frame, 11, 75, 75)
     
-    def auto_white_balance(self, frame):
+    def auto_white_balance(self, frame, means=None):
         try:
             lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-            avg_a = np.mean(lab[:, :, 1])
-            avg_b = np.mean(lab[:, :, 2])
+            if means is None:
+                avg_a = np.mean(lab[:, :, 1])
+                avg_b = np.mean(lab[:, :, 2])
+            else:
+                avg_a, avg_b = means
             lab[:, :, 1] = lab[:, :, 1] - ((avg_a - 128) * (lab[:, :, 0] / 255.0) * 1.2)
             lab[:, :, 2] = lab[:, :, 2] - ((avg_b - 128) * (lab[:, :, 0] / 255.0) * 1.2)
             lab[:, :, 1] = np.clip(lab[:, :, 1], 0, 255)
@@ -67,7 +402,8 @@ class VideoEnhancer:
         lab = cv2.merge([l, a, b])
         return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
     
-    def enhance_frame(self, frame, preset='original'):
+    def enhance_frame(self, frame, preset='original', white_balance_means=None):
+        """white_balance_means replaces the per-frame LAB a/b means (see WhiteBalanceTracker)"""
         if preset not in self.enhancement_presets:
             preset = 'original'
         
@@ -78,25 +414,294 @@ class VideoEnhancer:
         
         try:
             enhanced = frame.copy()
-            enhanced = self.auto_white_balance(enhanced)
-            enhanced = self.enhance_contrast_adaptive(enhanced)
-            enhanced = self.adjust_brightness_contrast(
+            enhanced = self.run_stage('white_balance', self.auto_white_balance, enhanced, white_balance_means)
+            enhanced = self.run_stage('clahe', self.enhance_contrast_adaptive, enhanced)
+            enhanced = self.run_stage(
+                'brightness_contrast',
+                self.adjust_brightness_contrast,
                 enhanced, 
                 brightness=config['brightness'], 
                 contrast=config['contrast']
             )
-            enhanced = self.adjust_saturation(enhanced, saturation=config['saturation'])
-            enhanced = self.enhance_sharpness(enhanced, strength=config['sharpness'])
-            enhanced = self.reduce_noise(enhanced)
+            enhanced = self.run_stage('saturation', self.adjust_saturation, enhanced, saturation=config['saturation'])
+            enhanced = self.run_stage('sharpness', self.enhance_sharpness, enhanced, strength=config['sharpness'])
+            enhanced = self.run_stage('noise_reduction', self.reduce_noise, enhanced)
             return enhanced
             
         except Exception as e:
             print(f"Frame enhancement error: {e}")
             return frame
 
-class VideoDecoder:
+class FusedVideoEnhancer(VideoEnhancer):
+    """Faster drop-in replacement for VideoEnhancer.enhance_frame.
+    
+    Brightness/contrast and saturation are applied through 256-entry lookup
+    tables built once per preset, and white balance and CLAHE share a single
+    LAB conversion. Output is not bit-exact with VideoEnhancer: white
+    balance rounds and saturates where VideoEnhancer truncates (and wraps
+    out-of-range values), and the LAB round-trip between white balance and
+    CLAHE is skipped. Contrast and sharpening amplify those differences; on
+    1280x720 test frames the largest per-channel difference was 10 (bright),
+    14 (standard/custom), 19 (cinematic), 23 (vivid) and 31 (crisp) levels,
+    with 99.9% of values within 6-22 levels.
+    """
     def __init__(self):
-        self.enhancer = VideoEnhancer()
+        super().__init__()
+        self.preset_tables = {}
+    
+    def build_preset_tables(self, preset):
+        config = self.enhancement_presets[preset]
+        levels = np.arange(256, dtype=np.float32)
+        
+        brightness_contrast = levels * np.float32(config['contrast']) + np.float32(config['brightness'])
+        brightness_contrast = np.clip(brightness_contrast, 0, 255).astype(np.uint8)
+        
+        saturation = np.clip(levels * np.float32(config['saturation']), 0, 255).astype(np.uint8)
+        identity = np.arange(256, dtype=np.uint8)
+        hsv_table = np.dstack([identity, saturation, identity])
+        
+        sharpen_kernel = None
+        if config['sharpness'] != 1.0:
+            sharpen_kernel = np.array([[-1, -1, -1],
+                                       [-1, 9.5 * config['sharpness'], -1],
+                                       [-1, -1, -1]])
+            sharpen_kernel = sharpen_kernel / np.sum(np.abs(sharpen_kernel))
+        
+        tables = {
+            'brightness_contrast': brightness_contrast.reshape(1, 256),
+            'hsv': hsv_table.reshape(1, 256, 3),
+            'apply_brightness_contrast': not (config['brightness'] == 0 and config['contrast'] == 1.0),
+            'apply_saturation': config['saturation'] != 1.0,
+            'sharpen_kernel': sharpen_kernel
+        }
+        self.preset_tables[preset] = tables
+        return tables
+    
+    def white_balance_and_clahe(self, frame, means=None):
+        lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
+        l, a, b = cv2.split(lab)
+        
+        mean_a, mean_b = (np.mean(a), np.mean(b)) if means is None else means
+        shift_a = (mean_a - 128) * 1.2 / 255.0
+        shift_b = (mean_b - 128) * 1.2 / 255.0
+        a = cv2.addWeighted(a, 1.0, l, -shift_a, 0)
+        b = cv2.addWeighted(b, 1.0, l, -shift_b, 0)
+        
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        l = clahe.apply(l)
+        return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+    
+    def apply_saturation_table(self, frame, hsv_table):
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        return cv2.cvtColor(cv2.LUT(hsv, hsv_table), cv2.COLOR_HSV2BGR)
+    
+    def enhance_frame(self, frame, preset='original', white_balance_means=None):
+        if preset not in self.enhancement_presets:
+            preset = 'original'
+        
+        if preset == 'original':
+            return frame
+        
+        tables = self.preset_tables.get(preset) or self.build_preset_tables(preset)
+        
+        try:
+            enhanced = self.run_stage('white_balance_clahe', self.white_balance_and_clahe, frame, white_balance_means)
+            if tables['apply_brightness_contrast']:
+                enhanced = self.run_stage('brightness_contrast', cv2.LUT, enhanced, tables['brightness_contrast'])
+            if tables['apply_saturation']:
+                enhanced = self.run_stage('saturation', self.apply_saturation_table, enhanced, tables['hsv'])
+            if tables['sharpen_kernel'] is not None:
+                enhanced = self.run_stage('sharpness', cv2.filter2D, enhanced, -1, tables['sharpen_kernel'])
+            enhanced = self.run_stage('noise_reduction', self.reduce_noise, enhanced)
+            return enhanced
+        
+        except Exception as e:
+            print(f"Frame enhancement error: {e}")
+            return frame
+
+class FastVideoEnhancer(FusedVideoEnhancer):
+    """'fast' quality tier of FusedVideoEnhancer for high resolution frames.
+    
+    The bilateral filter, the CLAHE tone curve and the white balance means
+    are computed on a copy downscaled to analysis_width and carried back to
+    full resolution: CLAHE as an upsampled per-pixel lightness delta and the
+    bilateral filter as an upsampled base layer plus the full resolution
+    detail, faded out below detail_threshold so sensor noise is dropped and
+    edges are kept. Frames no wider than analysis_width take the fused path.
+    """
+    def __init__(self, analysis_width=960, detail_threshold=16):
+        super().__init__()
+        self.analysis_width = analysis_width
+        levels = np.arange(256, dtype=np.float32)
+        half = detail_threshold / 2
+        self.detail_weights = np.clip((levels - half) / half, 0, 1).reshape(1, 256)
+    
+    def analysis_scale(self, frame):
+        return self.analysis_width / frame.shape[1]
+    
+    def downscale(self, frame, scale):
+        size = (self.analysis_width, max(1, int(round(frame.shape[0] * scale))))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    
+    def upscale(self, frame, shape):
+        return cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_LINEAR)
+    
+    def white_balance_and_clahe(self, frame, means=None):
+        scale = self.analysis_scale(frame)
+        if scale >= 1:
+            return super().white_balance_and_clahe(frame, means)
+        
+        lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
+        l, a, b = cv2.split(lab)
+        small_lab = self.downscale(lab, scale)
+        
+        mean_a, mean_b = cv2.mean(small_lab)[1:3] if means is None else means
+        a = cv2.addWeighted(a, 1.0, l, -(mean_a - 128) * 1.2 / 255.0, 0)
+        b = cv2.addWeighted(b, 1.0, l, -(mean_b - 128) * 1.2 / 255.0, 0)
+        
+        small_l = np.ascontiguousarray(small_lab[:, :, 0])
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        delta = cv2.subtract(clahe.apply(small_l), small_l, dtype=cv2.CV_16S)
+        l = cv2.add(l, self.upscale(delta, l.shape), dtype=cv2.CV_8U)
+        return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+    
+    def reduce_noise(self, frame):
+        scale = self.analysis_scale(frame)
+        if scale >= 1:
+            return super().reduce_noise(frame)
+        
+        small = self.downscale(frame, scale)
+        diameter = max(3, int(round(11 * scale)) | 1)
+        base = self.upscale(cv2.bilateralFilter(small, diameter, 75, 75 * scale), frame.shape)
+        low = self.upscale(small, frame.shape)
+        
+        weights = cv2.LUT(cv2.absdiff(frame, low), self.detail_weights)
+        detail = cv2.multiply(cv2.subtract(frame, low, dtype=cv2.CV_32F), weights)
+        return cv2.add(base, detail, dtype=cv2.CV_8U)
+
+class WhiteBalanceTracker:
+    """Temporally smoothed white balance statistics shared across frames.
+    
+    Instead of measuring every frame, the LAB a/b means are measured on a
+    small copy of every interval-th frame and blended into the running
+    values with an exponential moving average (smoothing is the weight of
+    the new measurement), which also keeps the colour correction from
+    flickering. A measurement more than scene_jump levels away from the
+    running values is treated as a scene change and replaces them outright.
+    With interval 0 the values are only measured again after reset(), i.e.
+    once per scene when driven by a SceneCutDetector. update() has to be
+    called in frame order.
+    """
+    def __init__(self, interval=15, smoothing=0.3, scene_jump=6.0, sample_width=160):
+        self.interval = max(0, interval)
+        self.smoothing = smoothing
+        self.scene_jump = scene_jump
+        self.sample_width = sample_width
+        self.reset()
+    
+    def reset(self):
+        self.means = None
+        self.last_update = None
+    
+    def due(self, position):
+        if self.means is None:
+            return True
+        return self.interval > 0 and position - self.last_update >= self.interval
+    
+    def measure(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.sample_width:
+            size = (self.sample_width, max(1, int(round(height * self.sample_width / width))))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2LAB))[1:3]
+    
+    def update(self, frame, position):
+        measured = self.measure(frame)
+        if self.means is None or max(abs(m - c) for m, c in zip(measured, self.means)) > self.scene_jump:
+            self.means = measured
+        else:
+            self.means = tuple(c + self.smoothing * (m - c) for m, c in zip(measured, self.means))
+        self.last_update = position
+        return self.means
+
+class SceneCutDetector:
+    """Histogram scene-cut detector for consecutive frames.
+    
+    Each frame is reduced to sample_width pixels wide and summarised by
+    normalised cumulative hue, saturation and value histograms. A cut is
+    reported when the mean distance between the cumulative histograms of
+    two consecutive frames (the 1-D earth mover's distance, as a fraction of
+    each channel's range) exceeds threshold. Unlike bin-by-bin comparisons
+    this grows with how far the colours moved, so gradual lighting changes
+    and pans over flat areas do not trigger cuts.
+    """
+    def __init__(self, threshold=0.1, sample_width=64, bins=32):
+        self.threshold = threshold
+        self.sample_width = sample_width
+        self.bins = bins
+        self.previous = None
+    
+    def reset(self):
+        self.previous = None
+    
+    def histograms(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.sample_width:
+            size = (self.sample_width, max(1, int(round(height * self.sample_width / width))))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        histograms = np.stack([
+            cv2.calcHist([hsv], [channel], None, [self.bins], [0, value_range]).ravel()
+            for channel, value_range in ((0, 180), (1, 256), (2, 256))
+        ])
+        return np.cumsum(histograms / histograms.sum(axis=1, keepdims=True), axis=1)
+    
+    def distance(self, first, second):
+        return float(np.abs(first - second).mean())
+    
+    def is_cut(self, frame):
+        """Returns True when frame starts a new scene (including the first frame)"""
+        histograms = self.histograms(frame)
+        previous, self.previous = self.previous, histograms
+        return previous is None or self.distance(previous, histograms) > self.threshold
+
+def parse_frame_position(value, fps):
+    """Converts a frame number ('1200') or a timestamp ('90s', '1:30', '01:02:03.5') to a frame index"""
+    if value is None or isinstance(value, int):
+        return value
+    text = str(value).strip()
+    try:
+        if ':' in text:
+            seconds = 0.0
+            for part in text.split(':'):
+                seconds = seconds * 60 + float(part)
+            return int(round(seconds * fps))
+        if text.endswith('s'):
+            return int(round(float(text[:-1]) * fps))
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Invalid frame position: {value} (use a frame number, 90s or mm:ss)")
+
+class VideoDecoder:
+    def __init__(self, fused=False, profile=False, profile_output=None, quality='full', stats_interval=0,
+                 scene_detection=False):
+        if quality == 'fast':
+            self.enhancer = FastVideoEnhancer()
+        else:
+            self.enhancer = FusedVideoEnhancer() if fused else VideoEnhancer()
+        self.white_balance_tracker = None
+        if stats_interval > 0 or scene_detection:
+            self.white_balance_tracker = WhiteBalanceTracker(stats_interval)
+        self.scene_detector = SceneCutDetector() if scene_detection else None
+        self.scenes = []
+        self.profiler = StageProfiler() if profile or profile_output else None
+        self.profile_output = profile_output
+        self.enhancer.profiler = self.profiler
+    
+    def run_stage(self, stage, func, *args, **kwargs):
+        if self.profiler is None:
+            return func(*args, **kwargs)
+        return self.profiler.run(stage, func, *args, **kwargs)
     
     def find_ooo_files(self):
         src_dir = os.path.join(os.path.dirname(__file__), 'src')
@@ -111,6 +716,9 @@ class VideoDecoder:
                 return False, "File does not exist"
             if not file_path.lower().endswith('.ooo'):
                 return False, "File must have .ooo extension"
+            if self.is_binary_ooo(file_path):
+                self.read_v2_metadata(file_path)
+                return True, "Valid file"
             with open(file_path, 'r', encoding='utf-8') as file:
                 data = json.load(file)
             if 'metadata' not in data or 'frames' not in data:
@@ -121,16 +729,22 @@ class VideoDecoder:
         except Exception as e:
             return False, f"Validation error: {e}"
     
-    def load_encoded_data(self, input_path):
-        try:
-            with open(input_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-            if 'metadata' not in data or 'frames' not in data:
-                raise ValueError("Invalid .ooo file structure")
-            print(f"✅ .ooo file loaded successfully")
-            return data
-        except Exception as e:
-            raise Exception(f"Error loading .ooo file: {e}")
+    def is_binary_ooo(self, file_path):
+        with open(file_path, 'rb') as file:
+            return file.read(len(OOO_MAGIC)) == OOO_MAGIC
+    
+    def read_v2_metadata(self, file_path):
+        with open(file_path, 'rb') as file:
+            header = file.read(OOO_HEADER.size)
+            if len(header) < OOO_HEADER.size:
+                raise ValueError("Truncated .ooo header")
+            magic, version, metadata_offset, metadata_length = OOO_HEADER.unpack(header)
+            if magic != OOO_MAGIC or version != 2:
+                raise ValueError(f"Unsupported .ooo container version: {version}")
+            if metadata_offset == 0:
+                raise ValueError("Incomplete .ooo file (metadata was never written)")
+            file.seek(metadata_offset)
+            return json.loads(file.read(metadata_length).decode('utf-8'))
     
     def get_video_name_from_ooo(self, ooo_path):
         filename = Path(ooo_path).stem
@@ -155,13 +769,119 @@ class VideoDecoder:
         
         return output_file
     
-    def decode_and_enhance(self, input_path, output_path, preset='original'):
+    def iter_processed_frames(self, process_frame, frame_indices, workers=1):
+        """Yields (index, result, error) for each frame in input order.
+        
+        With more than one worker, frames are processed on a thread pool
+        (OpenCV releases the GIL) with at most two frames in flight per
+        worker, so memory stays bounded while the writer keeps frame order.
+        """
+        if workers <= 1:
+            for i in frame_indices:
+                try:
+                    yield i, process_frame(i), None
+                except Exception as e:
+                    yield i, None, e
+            return
+        
+        max_in_flight = workers * 2
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for i in frame_indices:
+                pending.append((i, executor.submit(process_frame, i)))
+                if len(pending) >= max_in_flight:
+                    yield self._collect_frame_result(*pending.popleft())
+            while pending:
+                yield self._collect_frame_result(*pending.popleft())
+    
+    def _collect_frame_result(self, i, future):
+        try:
+            return i, future.result(), None
+        except Exception as e:
+            return i, None, e
+    
+    def select_frames(self, reader, start=None, end=None, stride=1):
+        """Returns the range of frame indices to decode; start/end accept frame numbers or timestamps"""
+        fps = reader.metadata.get('fps', 30)
+        total_frames = len(reader)
+        start = parse_frame_position(start, fps)
+        end = parse_frame_position(end, fps)
+        start = 0 if start is None else max(0, min(start, total_frames))
+        end = total_frames if end is None else max(start, min(end, total_frames))
+        if stride < 1:
+            raise ValueError(f"Stride must be at least 1, got {stride}")
+        return range(start, end, stride)
+    
+    def iter_jpeg_payloads(self, reader, frame_indices=None):
+        """Yields a standalone JPEG for every selected frame, re-encoding only delta patches"""
+        if frame_indices is None:
+            frame_indices = range(len(reader))
+        previous_index = previous_payload = None
+        for i in frame_indices:
+            payload = reader.read_bytes(i)
+            if reader.delta_encoded and not reader.is_keyframe(i):
+                # An empty payload repeats frame i - 1, which is only at hand if it was the last one yielded
+                if payload or previous_index != i - 1:
+                    frame = self.run_stage('delta_decode', reader.decode, i)
+                    _, buffer = self.run_stage('imencode', cv2.imencode, '.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                    payload = buffer.tobytes()
+                else:
+                    payload = previous_payload
+            previous_index, previous_payload = i, payload
+            yield i, payload
+    
+    def passthrough_to_mjpeg(self, reader, output_path, fps, frame_indices=None):
+        if frame_indices is None:
+            frame_indices = range(len(reader))
+        total_frames = len(frame_indices)
+        resolution = reader.metadata.get('resolution', '0x0')
+        width, height = (int(value) for value in resolution.split('x'))
+        if width == 0 or height == 0:
+            height, width = reader.decode(0).shape[:2]
+        
+        start_time = time.perf_counter()
+        writer = MjpegAviWriter(output_path, width, height, fps)
+        try:
+            for done, (i, payload) in enumerate(self.iter_jpeg_payloads(reader, frame_indices), 1):
+                self.run_stage('avi_write', writer.add_frame, payload)
+                if done % 500 == 0:
+                    print(f"Progress: {done}/{total_frames} ({done / total_frames * 100:.1f}%)")
+            writer.close()
+        except Exception:
+            writer.abort()
+            raise
+        
+        total_time = time.perf_counter() - start_time
+        file_size = os.path.getsize(output_path) / (1024 * 1024)
+        print(f"\n✅ Decoding completed!")
+        print(f"Final statistics:")
+        print(f"   - Total time: {total_time:.1f} seconds")
+        print(f"   - Processed frames: {total_frames}/{total_frames}")
+        print(f"   - File size: {file_size:.2f} MB")
+        if total_time > 0:
+            print(f"   - Average speed: {total_frames / total_time:.1f} FPS")
+        print(f"File saved to: {output_path}")
+        if self.profiler:
+            self.profiler.print_report()
+            if self.profile_output:
+                self.profiler.export_json(self.profile_output)
+        return True
+    
+    def decode_and_enhance(self, input_path, output_path, preset='original', workers=1, start=None, end=None, stride=1,
+                           track=None):
+        """Decodes (and enhances) the frames in [start, end) every stride frames.
+        
+        Only the selected payloads are read and decoded, using the frame
+        index. The output keeps the original duration per frame, so a
+        stride of N plays back at fps / N. track decodes the 'proxy' or
+        'thumbnails' track instead of the full-resolution frames.
+        """
         try:
             print("Loading encoded data...")
-            encoded_data = self.load_encoded_data(input_path)
-            frames_data = encoded_data['frames']
-            total_frames = len(frames_data)
-            metadata = encoded_data['metadata']
+            reader = OooVideoReader(input_path, track)
+            print(f"✅ .ooo file loaded successfully")
+            total_frames = len(reader)
+            metadata = reader.metadata
             
             original_fps = metadata.get('fps', 30)
             original_resolution = metadata.get('resolution', 'Unknown')
@@ -170,49 +890,125 @@ class VideoDecoder:
             print(f"   - Frames: {total_frames}")
             print(f"   - FPS: {original_fps}")
             print(f"   - Resolution: {original_resolution}")
+            if track:
+                print(f"   - Track: {track}")
+            elif reader.tracks:
+                print(f"   - Side tracks: {', '.join(reader.tracks)}")
+            if reader.delta_encoded:
+                print(f"   - Delta encoded (keyframe every {metadata['delta_encoding']['keyframe_interval']} frames)")
+            
+            try:
+                frame_indices = self.select_frames(reader, start, end, stride)
+            except ValueError:
+                reader.close()
+                raise
+            output_fps = original_fps / frame_indices.step
+            if len(frame_indices) != total_frames:
+                print(f"Selected frames: {frame_indices.start}-{frame_indices.stop} every {frame_indices.step} "
+                      f"({len(frame_indices)} frames, output FPS: {output_fps:g})")
+            total_frames = len(frame_indices)
+            
+            if preset == 'original' and output_path.lower().endswith('.avi'):
+                print("Mode: ORIGINAL passthrough (JPEG frames muxed into MJPEG AVI)")
+                try:
+                    return self.passthrough_to_mjpeg(reader, output_path, output_fps, frame_indices)
+                finally:
+                    reader.close()
             
             if preset == 'original':
                 print("Mode: ORIGINAL (no enhancements)")
             else:
                 print(f"Applying enhancements with preset: {preset}")
+            if workers > 1:
+                print(f"Parallel mode: {workers} workers")
             
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             out = None
             start_time = cv2.getTickCount()
             processed_frames = 0
             
-            for i, frame_info in enumerate(frames_data):
+            def decode_frame(i):
+                if reader.delta_encoded:
+                    return self.run_stage('delta_decode', reader.decode, i)
+                frame_data = self.run_stage('payload_read', reader.read_bytes, i)
+                frame_array = np.frombuffer(frame_data, np.uint8)
+                return self.run_stage('imdecode', cv2.imdecode, frame_array, cv2.IMREAD_COLOR)
+            
+            tracker = self.white_balance_tracker if preset != 'original' else None
+            detector = self.scene_detector if tracker else None
+            prefetched_frames = {}
+            frame_means = {}
+            self.scenes = []
+            
+            def prefetch_frame(i):
+                if i not in prefetched_frames:
+                    try:
+                        prefetched_frames[i] = decode_frame(i)
+                    except Exception:
+                        prefetched_frames[i] = None
+                return prefetched_frames[i]
+                    
+            def scheduled_indices():
+                # Scene cuts and white balance statistics are evaluated here, in
+                # frame order, before each frame is handed to a worker; frames
+                # decoded for them are passed along so they are not decoded twice.
+                # Each scene's parameters are measured once and cached in self.scenes.
+                tracker.reset()
+                if detector:
+                    detector.reset()
+                for position, i in enumerate(frame_indices):
+                    if detector:
+                        frame = prefetch_frame(i)
+                        if frame is not None and self.run_stage('scene_detect', detector.is_cut, frame):
+                            tracker.reset()
+                            self.scenes.append({'start_frame': i, 'white_balance': None})
+                    if tracker.due(position):
+                        frame = prefetch_frame(i)
+                        if frame is not None:
+                            self.run_stage('white_balance_stats', tracker.update, frame, position)
+                    if self.scenes and self.scenes[-1]['white_balance'] is None:
+                        self.scenes[-1]['white_balance'] = tracker.means
+                    frame_means[i] = tracker.means
+                    yield i
+            
+            def process_frame(i):
+                frame = prefetched_frames.pop(i, None)
+                if frame is None:
+                    frame = decode_frame(i)
+                if frame is None or preset == 'original':
+                    return frame
+                return self.run_stage('enhance_total', self.enhancer.enhance_frame, frame, preset, frame_means.pop(i, None))
+            
+            if detector:
+                print("Scene detection: enhancement parameters computed once per scene")
+            if tracker and tracker.interval:
+                print(f"Temporal white balance: statistics refreshed every {tracker.interval} frames")
+            indices = scheduled_indices() if tracker else frame_indices
+            for done, (i, enhanced_frame, error) in enumerate(self.iter_processed_frames(process_frame, indices, workers), 1):
                 try:
-                    frame_base64 = frame_info['data']
-                    frame_data = base64.b64decode(frame_base64)
-                    frame_array = np.frombuffer(frame_data, np.uint8)
-                    frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
+                    if error is not None:
+                        raise error
                     
-                    if frame is None:
+                    if enhanced_frame is None:
                         print(f"Skipping frame {i} due to decode error")
                         continue
                     
-                    if preset == 'original':
-                        enhanced_frame = frame
-                    else:
-                        enhanced_frame = self.enhancer.enhance_frame(frame, preset)
-                    
                     if out is None:
                         height, width = enhanced_frame.shape[:2]
-                        out = cv2.VideoWriter(output_path, fourcc, original_fps, (width, height))
-                        print(f"Video configured: {width}x{height}, FPS: {original_fps}")
+                        out = cv2.VideoWriter(output_path, fourcc, output_fps, (width, height))
+                        print(f"Video configured: {width}x{height}, FPS: {output_fps:g}")
                     
-                    out.write(enhanced_frame)
+                    self.run_stage('video_write', out.write, enhanced_frame)
                     processed_frames += 1
                     
-                    if (i + 1) % 30 == 0 or (i + 1) == total_frames:
+                    if done % 30 == 0 or done == total_frames:
                         elapsed_time = (cv2.getTickCount() - start_time) / cv2.getTickFrequency()
-                        frames_per_second = (i + 1) / elapsed_time if elapsed_time > 0 else 0
-                        progress_percent = ((i + 1) / total_frames) * 100
-                        remaining_frames = total_frames - (i + 1)
+                        frames_per_second = done / elapsed_time if elapsed_time > 0 else 0
+                        progress_percent = (done / total_frames) * 100
+                        remaining_frames = total_frames - done
                         eta_seconds = remaining_frames / frames_per_second if frames_per_second > 0 else 0
                         
-                        print(f"Progress: {i + 1}/{total_frames} ({progress_percent:.1f}%) | "
+                        print(f"Progress: {done}/{total_frames} ({progress_percent:.1f}%) | "
                               f"Speed: {frames_per_second:.1f} FPS | "
                               f"ETA: {eta_seconds:.1f}s")
                         
@@ -222,6 +1018,7 @@ class VideoDecoder:
             
             if out:
                 out.release()
+            reader.close()
             
             total_time = (cv2.getTickCount() - start_time) / cv2.getTickFrequency()
             
@@ -233,7 +1030,15 @@ class VideoDecoder:
                 print(f"   - Processed frames: {processed_frames}/{total_frames}")
                 print(f"   - File size: {file_size:.2f} MB")
                 print(f"   - Average speed: {total_frames/total_time:.1f} FPS")
+                if detector:
+                    starts = ', '.join(str(scene['start_frame']) for scene in self.scenes[:10])
+                    more = ', ...' if len(self.scenes) > 10 else ''
+                    print(f"   - Scenes: {len(self.scenes)} (starting at frames {starts}{more})")
                 print(f"File saved to: {output_path}")
+                if self.profiler:
+                    self.profiler.print_report()
+                    if self.profile_output:
+                        self.profiler.export_json(self.profile_output)
                 return True
             else:
                 print("Error: Output file was not created")
@@ -322,8 +1127,83 @@ def select_file_interactively():
         except:
             return ooo_files[0]
 
+def parse_workers_arg(argv):
+    if '--workers' not in argv:
+        return 1
+    try:
+        return max(1, int(argv[argv.index('--workers') + 1]))
+    except (IndexError, ValueError):
+        print("Invalid --workers value, using 1 worker")
+        return 1
+
+def parse_stats_interval_arg(argv):
+    """Reads --temporal-stats [N]: refresh white balance statistics every N frames (default 15)"""
+    if '--temporal-stats' not in argv:
+        return 0
+    index = argv.index('--temporal-stats') + 1
+    if index >= len(argv) or argv[index].startswith('--'):
+        return 15
+    try:
+        return max(1, int(argv[index]))
+    except ValueError:
+        print("Invalid --temporal-stats value, refreshing every 15 frames")
+        return 15
+
+def parse_frame_range_args(argv):
+    """Reads --start/--end (frame number or timestamp) and --stride from the command line"""
+    def value_of(name):
+        if name not in argv:
+            return None
+        index = argv.index(name) + 1
+        if index >= len(argv):
+            raise ValueError(f"{name} needs a value")
+        return argv[index]
+    
+    start, end = value_of('--start'), value_of('--end')
+    for value in (start, end):
+        parse_frame_position(value, 30)
+    stride = value_of('--stride')
+    try:
+        stride = 1 if stride is None else int(stride)
+    except ValueError:
+        raise ValueError(f"Invalid --stride value: {stride}")
+    if stride < 1:
+        raise ValueError(f"Invalid --stride value: {stride}")
+    return start, end, stride
+
 def main():
-    decoder = VideoDecoder()
+    profile_output = None
+    if '--profile-json' in sys.argv:
+        profile_index = sys.argv.index('--profile-json') + 1
+        profile_output = sys.argv[profile_index] if profile_index < len(sys.argv) else 'profile.json'
+    quality = 'full'
+    if '--quality' in sys.argv:
+        quality_index = sys.argv.index('--quality') + 1
+        quality = sys.argv[quality_index] if quality_index < len(sys.argv) else None
+        if quality not in ('full', 'fast'):
+            print("Invalid --quality value, use full or fast")
+            return
+    decoder = VideoDecoder(
+        fused='--fused' in sys.argv,
+        profile='--profile' in sys.argv,
+        profile_output=profile_output,
+        quality=quality,
+        stats_interval=parse_stats_interval_arg(sys.argv),
+        scene_detection='--scene-detect' in sys.argv
+    )
+    workers = parse_workers_arg(sys.argv)
+    try:
+        start, end, stride = parse_frame_range_args(sys.argv)
+    except ValueError as e:
+        print(e)
+        return
+    track = None
+    if '--track' in sys.argv:
+        track_index = sys.argv.index('--track') + 1
+        track = sys.argv[track_index] if track_index < len(sys.argv) else None
+        if track not in ('proxy', 'thumbnails'):
+            print("Invalid --track value, use proxy or thumbnails")
+            return
     
     print("=== VIDEO DECODER ===")
     
@@ -374,11 +1254,21 @@ def main():
         output_dir = os.path.join(os.path.dirname(__file__), 'src')
     
     original_name = decoder.get_video_name_from_ooo(selected_file)
-    output_file = decoder.get_output_filename(original_name, selected_preset, output_dir=output_dir)
+    if track:
+        original_name = f"{original_name}_{track}"
+    output_format = 'avi' if selected_preset == 'original' and '--passthrough' in sys.argv else 'mp4'
+    output_file = decoder.get_output_filename(original_name, selected_preset, output_format, output_dir=output_dir)
     
     print(f"\nDecoding configuration:")
     print(f"   - File: {Path(selected_file).name}")
     print(f"   - Preset: {selected_preset.upper()}")
+    print(f"   - Workers: {workers}")
+    if quality == 'fast':
+        print(f"   - Quality: fast (reduced-scale analysis)")
+    if track:
+        print(f"   - Track: {track}")
+    if start is not None or end is not None or stride > 1:
+        print(f"   - Frames: {start or 'start'} to {end or 'end'}, stride {stride}")
     print(f"   - Output: {output_file}")
     
     print("\nStart decoding? (y/n):")
@@ -389,7 +1279,7 @@ def main():
         return
     
     print("\n" + "="*50)
-    success = decoder.decode_and_enhance(selected_file, output_file, selected_preset)
+    success = decoder.decode_and_enhance(selected_file, output_file, selected_preset, workers, start, end, stride, track)
     
     if success:
         print(f"\n✅ PROCESS COMPLETED SUCCESSFULLY!")